@@ -0,0 +1,137 @@
+'''
+Array-backed action space and per-action usage analytics.
+
+ActionSpace keeps steering angles and speeds as two numpy arrays instead of a
+list of {"steering_angle", "speed"} dicts, and loads them from the
+model_metadata.json written next to every model. The usage methods count how
+often each action was taken, the reward it earned and where on the track it
+was used, with np.bincount over a whole run, so actions the policy never picks
+can be pruned from the next model's action space.
+'''
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class ActionSpace:
+
+    def __init__(self, steering, speed):
+        self.steering = np.asarray(steering, dtype=float)
+        self.speed = np.asarray(speed, dtype=float)
+        if self.steering.shape != self.speed.shape:
+            raise ValueError('steering and speed must have the same length')
+
+    @classmethod
+    def from_list(cls, actions):
+        """From a list of {"steering_angle": .., "speed": ..} dicts, as in model_metadata.json."""
+        return cls([a['steering_angle'] for a in actions], [a['speed'] for a in actions])
+
+    @classmethod
+    def grid(cls, steering_values, speed_values):
+        """Every combination of the given steering angles and speeds."""
+        steer, speed = np.meshgrid(steering_values, speed_values)
+        return cls(steer.ravel(), speed.ravel())
+
+    @classmethod
+    def from_metadata(cls, metadata, steering_bins=None, speed_bins=None):
+        """
+        Load from a model_metadata.json path or its parsed dict.
+
+        Continuous action spaces only store bounds; pass `steering_bins` and
+        `speed_bins` to discretize them into an evenly spaced grid.
+        """
+        if not isinstance(metadata, dict):
+            with open(metadata, 'r') as f:
+                metadata = json.load(f)
+        space = metadata['action_space']
+        if isinstance(space, list):
+            return cls.from_list(space)
+
+        if steering_bins is None or speed_bins is None:
+            raise ValueError('continuous action space: pass steering_bins and speed_bins to discretize it')
+        steer = np.linspace(space['steering_angle']['low'], space['steering_angle']['high'], steering_bins)
+        speed = np.linspace(space['speed']['low'], space['speed']['high'], speed_bins)
+        return cls.grid(steer, speed)
+
+    def __len__(self):
+        return len(self.steering)
+
+    def __getitem__(self, index):
+        return {'steering_angle': float(self.steering[index]), 'speed': float(self.speed[index])}
+
+    def to_list(self):
+        return [self[i] for i in range(len(self))]
+
+    def nearest(self, steering, speed, steering_scale=30.0, speed_scale=4.0):
+        """
+        Index of the closest action for each (steering, speed) pair, e.g. to map
+        the actions of a continuous model onto a candidate discrete space.
+        Both axes are normalized by their scale before measuring distance.
+        """
+        steering = np.asarray(steering, dtype=float)
+        speed = np.asarray(speed, dtype=float)
+        ds = (steering[:, None] - self.steering[None, :]) / steering_scale
+        dv = (speed[:, None] - self.speed[None, :]) / speed_scale
+        return np.argmin(ds * ds + dv * dv, axis=1)
+
+    def trace_actions(self, df):
+        """
+        Action index of every step of a trace. Discrete traces log the index in
+        the 'action' column; for continuous traces the nearest action to the
+        logged steer/throttle is used.
+        """
+        action = pd.to_numeric(df['action'], errors='coerce') if 'action' in df else None
+        if action is not None and not action.isna().any():
+            return action.values.astype(np.int64)
+        return self.nearest(df['steer'].values, df['throttle'].values)
+
+    def usage(self, actions, rewards=None):
+        """
+        DataFrame with one row per action: steering, speed, count, frequency and,
+        if rewards are given, total and mean reward.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        n = len(self)
+        count = np.bincount(actions, minlength=n)
+        data = {
+            'steering_angle': self.steering,
+            'speed': self.speed,
+            'count': count,
+            'frequency': count / max(len(actions), 1),
+        }
+        if rewards is not None:
+            total = np.bincount(actions, weights=np.asarray(rewards, dtype=float), minlength=n)
+            data['reward_sum'] = total
+            with np.errstate(invalid='ignore', divide='ignore'):
+                data['reward_mean'] = total / count
+        df = pd.DataFrame(data)
+        df.index.name = 'action'
+        return df
+
+    def section_usage(self, actions, sections, n_sections=None):
+        """Count matrix of actions (rows) by track section (columns)."""
+        actions = np.asarray(actions, dtype=np.int64)
+        sections = np.asarray(sections, dtype=np.int64)
+        if n_sections is None:
+            n_sections = int(sections.max()) + 1 if len(sections) else 0
+        n = len(self)
+        counts = np.bincount(actions * n_sections + sections,
+                             minlength=n * n_sections).reshape(n, n_sections)
+        df = pd.DataFrame(counts)
+        df.index.name = 'action'
+        df.columns.name = 'section'
+        return df
+
+    def prune(self, actions, min_frequency=0.0):
+        """
+        Drop actions used at most `min_frequency` of the time.
+
+        Returns (new ActionSpace, old_to_new) where old_to_new maps every old
+        index to its new index, or -1 for pruned actions.
+        """
+        freq = np.bincount(np.asarray(actions, dtype=np.int64), minlength=len(self)) / max(len(actions), 1)
+        keep = freq > min_frequency
+        old_to_new = np.full(len(self), -1, dtype=np.int64)
+        old_to_new[keep] = np.arange(keep.sum())
+        return ActionSpace(self.steering[keep], self.speed[keep]), old_to_new
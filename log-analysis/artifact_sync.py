@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+
+'''
+Content-addressed sync of model artifacts.
+
+Artifacts (metrics JSON, sim-trace CSVs, logs, checkpoints) are pulled into a
+local store where every file is kept once, named by its sha256:
+
+    <store>/objects/ab/cdef0123...      one blob per distinct content
+    <store>/index.json                  source URL and ETag -> sha256 of the content
+
+and each model folder is a view of hardlinks into the store, so the copies
+of the same evaluation metrics and sim-trace files under downloaded_model/<id>
+and intermediate_checkpoint/<id> take the space of one. Objects whose ETag was
+seen before are not downloaded again, and files whose content is already in
+the store are linked instead of stored twice. An ETag seen under any URL is
+enough to skip the download, so a copy of the same object under another model
+prefix is linked without fetching it. Downloads run in a thread pool.
+
+Blobs are read-only and shared by every view that has the same content, so
+view files must not be edited in place: copy a file out of the view to change
+it. A local source cannot be synced onto itself (or a folder inside it), since
+its files would be replaced by links into the store.
+
+Sources are an S3 prefix (boto3, any endpoint_url, so a local S3 stand-in
+such as MinIO works) or a local directory laid out like the bucket:
+
+    python artifact_sync.py s3://bucket/<prefix>/models/<id> downloaded_model/<id>
+    python artifact_sync.py s3://bucket/models/<id> views/<id> --endpoint-url http://localhost:9000
+    python artifact_sync.py bucket-copy/models/<id> downloaded_model/<id>
+
+S3Source also takes a ready client, e.g. one with its own credentials:
+
+    client = boto3.session.Session(profile_name='minio').client('s3', endpoint_url='http://localhost:9000')
+    sync(S3Source('bucket', 'models/<id>', client=client), ArtifactStore(), 'views/<id>')
+'''
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_STORE = '.artifacts'
+CHUNK = 1 << 20
+
+
+class S3Source:
+    """Objects under s3://bucket/prefix; keys are returned relative to the prefix."""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+
+    @classmethod
+    def from_url(cls, url, endpoint_url=None):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return cls(bucket, prefix, endpoint_url)
+
+    def list(self):
+        """(key, size, etag) of every object under the prefix."""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(self.prefix):]
+                if key and not key.endswith('/'):
+                    yield key, obj['Size'], obj['ETag'].strip('"')
+
+    def url(self, key):
+        return 's3://%s/%s%s' % (self.bucket, self.prefix, key)
+
+    def fetch(self, key, f):
+        self.client.download_fileobj(self.bucket, self.prefix + key, f)
+
+
+class LocalSource:
+    """
+    A directory used in place of a bucket, e.g. an existing model folder or a
+    local copy of a bucket for tests. ETags are the md5 of the content, as S3
+    reports for objects uploaded in one part.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def list(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                md5 = hashlib.md5()
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(CHUNK), b''):
+                        md5.update(block)
+                yield os.path.relpath(path, self.root).replace(os.sep, '/'), os.path.getsize(path), md5.hexdigest()
+
+    def url(self, key):
+        return 'file://' + os.path.join(self.root, key)
+
+    def fetch(self, key, f):
+        with open(os.path.join(self.root, key), 'rb') as src:
+            shutil.copyfileobj(src, f, CHUNK)
+
+
+class _HashingWriter:
+
+    def __init__(self, f):
+        self.f = f
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+
+class ArtifactStore:
+
+    def __init__(self, root=DEFAULT_STORE):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.tmp = os.path.join(root, 'tmp')
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.tmp, exist_ok=True)
+        self._index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        self.index = {}
+        self.etags = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                data = json.load(f)
+            self.index = data['urls']
+            self.etags = data['etags']
+
+    def blob_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def known(self, url, etag):
+        """
+        sha256 of the content of an object with this ETag, fetched before from
+        `url` or any other URL, if its blob is still present.
+        """
+        entry = self.index.get(url)
+        if entry and entry['etag'] == etag and self.has(entry['sha256']):
+            return entry['sha256']
+        digest = self.etags.get(etag)
+        if digest and self.has(digest):
+            return digest
+        return None
+
+    def put(self, fetch):
+        """
+        Store the content written by fetch(fileobj); returns (sha256, size, new)
+        where `new` is False when the content was already in the store.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.tmp)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = _HashingWriter(f)
+                fetch(writer)
+            digest = writer.sha.hexdigest()
+            blob = self.blob_path(digest)
+            if os.path.exists(blob):
+                return digest, writer.size, False
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, blob)
+            return digest, writer.size, True
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def remember(self, url, etag, digest, size):
+        with self._lock:
+            self.index[url] = {'etag': etag, 'sha256': digest, 'size': size}
+            self.etags[etag] = digest
+
+    def link(self, digest, path):
+        """Make `path` a hardlink to the blob (a copy if hardlinks are not possible)."""
+        blob = self.blob_path(digest)
+        if os.path.exists(path):
+            if os.path.samefile(path, blob):
+                return False
+            os.remove(path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        try:
+            os.link(blob, path)
+        except OSError:
+            shutil.copyfile(blob, path)
+        return True
+
+    def save(self):
+        with self._lock:
+            with open(self._index_path + '.tmp', 'w') as f:
+                json.dump({'urls': self.index, 'etags': self.etags}, f, indent=1, sort_keys=True)
+            os.replace(self._index_path + '.tmp', self._index_path)
+
+
+def sync(source, store, view, workers=8):
+    """
+    Pull every object of `source` into `store` and link it under the `view`
+    folder, which must not overlap a local source. Returns counts of listed,
+    downloaded, skipped (ETag already known), deduplicated (content already
+    stored) and linked files, and bytes fetched.
+    """
+    if isinstance(source, LocalSource):
+        view_root = os.path.realpath(view)
+        source_root = os.path.realpath(source.root)
+        if os.path.commonpath([view_root, source_root]) in (view_root, source_root):
+            raise ValueError('view %s overlaps the source folder %s' % (view, source.root))
+    stats = {'listed': 0, 'downloaded': 0, 'skipped': 0, 'deduplicated': 0, 'linked': 0, 'bytes': 0}
+    lock = threading.Lock()
+
+    def pull(item):
+        key, size, etag = item
+        url = source.url(key)
+        digest = store.known(url, etag)
+        if digest is None:
+            digest, fetched, new = store.put(lambda f: source.fetch(key, f))
+            store.remember(url, etag, digest, fetched)
+            counts = ('downloaded',) if new else ('downloaded', 'deduplicated')
+        else:
+            store.remember(url, etag, digest, size)
+            fetched, counts = 0, ('skipped',)
+        linked = store.link(digest, os.path.join(view, *key.split('/')))
+        with lock:
+            for c in counts:
+                stats[c] += 1
+            stats['bytes'] += fetched
+            stats['linked'] += linked
+
+    items = list(source.list())
+    stats['listed'] = len(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(pull, items))
+    store.save()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sync model artifacts into a content-addressed store.')
+    parser.add_argument('source', help='s3://bucket/prefix or a local folder')
+    parser.add_argument('view', help='folder to populate with hardlinks, e.g. downloaded_model/<id>')
+    parser.add_argument('--store', default=DEFAULT_STORE)
+    parser.add_argument('--endpoint-url', default=None, help='S3 endpoint, e.g. a local S3 stand-in')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    if args.source.startswith('s3://'):
+        source = S3Source.from_url(args.source, args.endpoint_url)
+    elif os.path.isdir(args.source):
+        source = LocalSource(args.source)
+    else:
+        print('source must be s3://bucket/prefix or a folder: %s' % args.source)
+        return 1
+    try:
+        stats = sync(source, ArtifactStore(args.store), args.view, args.workers)
+    except ValueError as e:
+        print(e)
+        return 1
+    print('%(listed)d objects: %(downloaded)d downloaded (%(deduplicated)d already stored), '
+          '%(skipped)d skipped by ETag, %(linked)d linked, %(bytes)d bytes' % stats)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
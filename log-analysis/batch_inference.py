@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+'''
+Batched CPU inference and Grad-CAM over the camera frames of an episode.
+
+deepracer.model.load_session / visualize_gradcam_discrete_ppo run one image
+per call and build new gradient ops every time. BatchAnalyzer imports the
+frozen model graph once, builds the Grad-CAM ops once, and feeds frames in
+batches while a thread pool reads or decodes the next batch. Action
+probabilities and heatmaps are written to .npy files through memory maps, so
+a whole episode is processed in bounded memory.
+
+    python batch_inference.py model/model_48.pb /tmp/episode3 /tmp/episode3_model48
+
+Frames can come from a frame_store.FrameStore prefix, a uint8 array or a list
+of PNG files, and must already be at the model input size (160x120).
+'''
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from frame_store import FrameStore, GRAY_WEIGHTS, decode_png
+
+INPUT_TENSOR = 'main_level/agent/main/online/network_0/{sensor}/{sensor}:0'
+POLICY_TENSOR = 'main_level/agent/main/online/network_1/ppo_head_0/policy:0'
+CONV_TENSOR = 'main_level/agent/main/online/network_1/{sensor}/Conv2d_4/Conv2D:0'
+
+
+def to_observation(frames):
+    """uint8 (B, H, W, 3|1) frames to the float (B, H, W, 1) grayscale model input."""
+    frames = np.asarray(frames)
+    if frames.shape[-1] == 3:
+        gray = frames.astype(np.float32) @ GRAY_WEIGHTS.astype(np.float32)
+    else:
+        gray = frames[..., 0].astype(np.float32)
+    return gray[..., None]
+
+
+def resize_bilinear(maps, height, width):
+    """Bilinear resize of a (B, h, w) stack of maps to (B, height, width)."""
+    b, h, w = maps.shape
+    ys = np.clip((np.arange(height) + 0.5) * h / height - 0.5, 0, h - 1)
+    xs = np.clip((np.arange(width) + 0.5) * w / width - 0.5, 0, w - 1)
+    y0 = np.floor(ys).astype(int)
+    x0 = np.floor(xs).astype(int)
+    y1 = np.minimum(y0 + 1, h - 1)
+    x1 = np.minimum(x0 + 1, w - 1)
+    wy = (ys - y0)[None, :, None]
+    wx = (xs - x0)[None, None, :]
+    top = maps[:, y0][:, :, x0] * (1 - wx) + maps[:, y0][:, :, x1] * wx
+    bottom = maps[:, y1][:, :, x0] * (1 - wx) + maps[:, y1][:, :, x1] * wx
+    return top * (1 - wy) + bottom * wy
+
+
+class BatchAnalyzer:
+
+    def __init__(self, pb_path, sensor='FRONT_FACING_CAMERA', threads=None):
+        import tensorflow.compat.v1 as tf
+        tf.disable_v2_behavior()
+        self.tf = tf
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            graph_def = tf.GraphDef()
+            with tf.io.gfile.GFile(pb_path, 'rb') as f:
+                graph_def.ParseFromString(f.read())
+            tf.import_graph_def(graph_def, name='')
+
+            self.obs = self.graph.get_tensor_by_name(INPUT_TENSOR.format(sensor=sensor))
+            self.policy = self.graph.get_tensor_by_name(POLICY_TENSOR)
+            self.conv = self.graph.get_tensor_by_name(CONV_TENSOR.format(sensor=sensor))
+            self.num_actions = int(self.policy.shape[-1])
+
+            # Grad-CAM ops, built once: gradient of the chosen action's
+            # probability w.r.t. the last conv layer, for every frame in the batch.
+            self.category = tf.placeholder(tf.int32, [None], name='gradcam_category')
+            score = tf.reduce_sum(self.policy * tf.one_hot(self.category, self.num_actions))
+            grads = tf.gradients(score, self.conv)[0]
+            weights = tf.reduce_mean(grads, axis=[1, 2], keepdims=True)
+            self.cam = tf.nn.relu(tf.reduce_sum(weights * self.conv, axis=3))
+
+        threads = threads or os.cpu_count()
+        config = tf.ConfigProto(device_count={'GPU': 0},
+                                intra_op_parallelism_threads=threads,
+                                inter_op_parallelism_threads=2)
+        self.sess = tf.Session(graph=self.graph, config=config)
+
+    def close(self):
+        self.sess.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def predict(self, frames):
+        """Action probabilities for a batch of uint8 frames."""
+        return self.sess.run(self.policy, feed_dict={self.obs: to_observation(frames)})
+
+    def gradcam(self, frames, category=None):
+        """
+        (probabilities, heatmaps) for a batch. Heatmaps are uint8 (B, H, W),
+        normalized per frame, for `category` or else each frame's top action.
+        """
+        obs = to_observation(frames)
+        probs = self.sess.run(self.policy, feed_dict={self.obs: obs})
+        if category is None:
+            category = np.argmax(probs, axis=1)
+        category = np.broadcast_to(np.asarray(category, dtype=np.int32), (len(obs),))
+        cams = self.sess.run(self.cam, feed_dict={self.obs: obs, self.category: category})
+        cams = resize_bilinear(cams, obs.shape[1], obs.shape[2])
+        peak = cams.reshape(len(cams), -1).max(axis=1)[:, None, None]
+        heat = np.where(peak > 0, cams / np.where(peak > 0, peak, 1), 0)
+        return probs, np.uint8(np.rint(255 * heat))
+
+    def run(self, source, out_prefix, batch_size=64, gradcam=True, category=None, workers=4):
+        """
+        Process every frame of `source` and write <out_prefix>_probs.npy
+        (float32, frames x actions) and, with gradcam, <out_prefix>_gradcam.npy
+        (uint8, frames x H x W). Returns frames per second.
+        """
+        if isinstance(source, str):
+            source = FrameStore(source)
+        is_files = isinstance(source, (list, tuple))
+        n = len(source)
+        if n == 0:
+            raise ValueError('no frames to process')
+
+        probs_out = np.lib.format.open_memmap(out_prefix + '_probs.npy', mode='w+',
+                                              dtype=np.float32, shape=(n, self.num_actions))
+        cam_out = None
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            def load(start):
+                stop = min(start + batch_size, n)
+                if is_files:
+                    return [pool.submit(decode_png, f) for f in source[start:stop]]
+                # np.array copies, so memmapped frames are read from disk in
+                # the worker rather than when the batch is first used.
+                return [pool.submit(lambda: np.array(source[start:stop]))]
+
+            pending = load(0)
+            for start in range(0, n, batch_size):
+                parts = [f.result() for f in pending]
+                frames = np.stack(parts) if is_files else parts[0]
+                # Queue the next batch before running this one.
+                if start + batch_size < n:
+                    pending = load(start + batch_size)
+
+                if gradcam:
+                    probs, heat = self.gradcam(frames, category)
+                    if cam_out is None:
+                        cam_out = np.lib.format.open_memmap(out_prefix + '_gradcam.npy', mode='w+',
+                                                            dtype=np.uint8, shape=(n,) + heat.shape[1:])
+                    cam_out[start:start + len(heat)] = heat
+                else:
+                    probs = self.predict(frames)
+                probs_out[start:start + len(probs)] = probs
+
+        probs_out.flush()
+        if cam_out is not None:
+            cam_out.flush()
+        return n / max(time.time() - start_time, 1e-9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batched action probabilities and Grad-CAM for episode frames.')
+    parser.add_argument('model', help='frozen model .pb file')
+    parser.add_argument('frames', help='frame_store prefix, or a directory of PNG frames')
+    parser.add_argument('out_prefix')
+    parser.add_argument('--sensor', default='FRONT_FACING_CAMERA')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--no-gradcam', action='store_true')
+    parser.add_argument('--category', type=int, default=None, help='action index for Grad-CAM, default top action')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    source = args.frames
+    if os.path.isdir(source):
+        from frame_store import FRAME_PATTERN, frame_number
+        source = sorted(glob.glob(os.path.join(source, FRAME_PATTERN)), key=frame_number)
+
+    with BatchAnalyzer(args.model, args.sensor) as analyzer:
+        fps = analyzer.run(source, args.out_prefix, args.batch_size, not args.no_gradcam,
+                           args.category, args.workers)
+    print('%.1f frames/s' % fps)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
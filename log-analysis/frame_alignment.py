@@ -0,0 +1,136 @@
+'''
+Alignment index between camera frames and simtrace rows of one episode.
+
+Frames (sim-image-3-NNNNN.png, or a frame_store pack of them) and trace rows
+are matched once, either in order (frame k is step k + offset) or by nearest
+timestamp. The index keeps the matched trace fields per frame and groups
+frames by section and action, so "frames in section 3" is a dict lookup and
+"frames where reward dropped below X" a binary search over pre-sorted rewards.
+'''
+import numpy as np
+import pandas as pd
+
+FIELDS = ('episode', 'steps', 'timestamp', 'x', 'y', 'steer', 'throttle', 'action', 'reward')
+
+
+def _groups(keys, frames):
+    """key -> array of frames having that key, from one stable sort."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    uniq, starts = np.unique(sorted_keys, return_index=True)
+    stops = np.append(starts[1:], len(order))
+    sorted_frames = frames[order]
+    return {k.item(): sorted_frames[a:b] for k, a, b in zip(uniq, starts, stops)}
+
+
+class FrameAlignment:
+
+    def __init__(self, frame_numbers, trace, frame_rows, sections=None):
+        """
+        `frame_rows[i]` is the position in `trace` of the row matching frame
+        `frame_numbers[i]`, or -1 if the frame has no trace row. `sections`
+        optionally gives a section id per trace row (see section_stats).
+        """
+        trace = trace.reset_index(drop=True)
+        self.frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+        self.frame_rows = np.asarray(frame_rows, dtype=np.int64)
+        if self.frame_rows.shape != self.frame_numbers.shape:
+            raise ValueError('need one trace row per frame')
+
+        self.row_frames = np.full(len(trace), -1, dtype=np.int64)
+        matched = self.frame_rows >= 0
+        self.row_frames[self.frame_rows[matched]] = self.frame_numbers[matched]
+        self._frame_pos = {f: i for i, f in enumerate(self.frame_numbers.tolist())}
+        self._step_frame = dict(zip(trace['steps'].values[self.frame_rows[matched]].tolist(),
+                                    self.frame_numbers[matched].tolist()))
+
+        rows = self.frame_rows[matched]
+        frames = self.frame_numbers[matched]
+        self.fields = {}
+        for name in FIELDS:
+            if name in trace:
+                col = np.full(len(self.frame_numbers), np.nan)
+                col[matched] = trace[name].values[rows]
+                self.fields[name] = col
+
+        self._by_action = {}
+        if 'action' in trace and not trace['action'].isna().any():
+            self._by_action = _groups(trace['action'].values[rows].astype(np.int64), frames)
+        self._by_section = {}
+        if sections is not None:
+            self._by_section = _groups(np.asarray(sections)[rows], frames)
+
+        reward = trace['reward'].values[rows]
+        order = np.argsort(reward, kind='stable')
+        self._reward_sorted = reward[order]
+        self._reward_frames = frames[order]
+
+    @classmethod
+    def by_order(cls, frame_numbers, trace, offset=0, sections=None):
+        """Frame k (in frame number order) is trace row k + offset."""
+        frame_numbers = np.sort(np.asarray(frame_numbers, dtype=np.int64))
+        rows = np.arange(len(frame_numbers)) + offset
+        rows[(rows < 0) | (rows >= len(trace))] = -1
+        return cls(frame_numbers, trace, rows, sections)
+
+    @classmethod
+    def by_timestamp(cls, frame_numbers, frame_timestamps, trace, max_gap=None, sections=None):
+        """
+        Match each frame to the trace row with the nearest timestamp; frames
+        further than `max_gap` seconds from any row stay unmatched. Frame and
+        trace timestamps must be on the same clock.
+        """
+        t = trace['timestamp'].values.astype(float)
+        order = np.argsort(t, kind='stable')
+        ts = t[order]
+        ft = np.asarray(frame_timestamps, dtype=float)
+        pos = np.clip(np.searchsorted(ts, ft), 1, len(ts) - 1)
+        left = ts[pos - 1]
+        right = ts[pos]
+        nearest = np.where(ft - left <= right - ft, pos - 1, pos)
+        rows = order[nearest]
+        if max_gap is not None:
+            rows[np.abs(ts[nearest] - ft) > max_gap] = -1
+        return cls(frame_numbers, trace, rows, sections)
+
+    @classmethod
+    def from_store(cls, store, trace, offset=0, sections=None):
+        """Align a frame_store.FrameStore in frame order."""
+        return cls.by_order(store.index['frame'], trace, offset, sections)
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def record(self, frame):
+        """Trace fields for a frame number."""
+        i = self._frame_pos[frame]
+        return {name: float(col[i]) for name, col in self.fields.items()}
+
+    def row(self, frame):
+        """Trace row position for a frame number, -1 if unmatched."""
+        return int(self.frame_rows[self._frame_pos[frame]])
+
+    def frame_for_row(self, row):
+        return int(self.row_frames[row])
+
+    def frame_for_step(self, step):
+        return self._step_frame.get(step, -1)
+
+    def frames_in_section(self, section):
+        return self._by_section.get(section, np.empty(0, dtype=np.int64))
+
+    def frames_for_action(self, action):
+        return self._by_action.get(action, np.empty(0, dtype=np.int64))
+
+    def frames_where_reward_below(self, value):
+        return self._reward_frames[:np.searchsorted(self._reward_sorted, value, side='left')]
+
+    def frames_where_reward_above(self, value):
+        return self._reward_frames[np.searchsorted(self._reward_sorted, value, side='right'):]
+
+    def frame(self):
+        """The alignment as a DataFrame, one row per frame."""
+        df = pd.DataFrame(self.fields)
+        df.insert(0, 'row', self.frame_rows)
+        df.insert(0, 'frame', self.frame_numbers)
+        return df
@@ -0,0 +1,153 @@
+'''
+Compact, memory-mapped storage for simulation_episode camera frames.
+
+pack_frames decodes the sim-image-*.png files of an episode once and writes
+them into one uint8 .npy tensor of shape (frames, height, width, channels),
+plus an index (.index.npz) with frame number, row offset, step and timestamp
+for every frame. Grayscale and downsampled variants can be written in the same
+pass. FrameStore opens a packed episode with np.load(mmap_mode='r'), so
+replay, Grad-CAM batches and video export slice frames straight from disk.
+
+Decoding uses Pillow, or OpenCV if Pillow is not installed.
+'''
+import glob
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FRAME_PATTERN = 'sim-image-*.png'
+
+# ITU-R 601 luma weights, same as deepracer.model.rgb2gray
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+
+def decode_png(path):
+    """RGB uint8 array of an image file, with PIL or else OpenCV."""
+    try:
+        from PIL import Image
+        with Image.open(path) as im:
+            return np.asarray(im.convert('RGB'))
+    except ImportError:
+        import cv2
+        return cv2.cvtColor(cv2.imread(path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+
+def frame_number(path):
+    """Trailing number of a frame file name: sim-image-3-00042.png -> 42."""
+    m = re.search(r'(\d+)\D*$', os.path.basename(path))
+    return int(m.group(1)) if m else -1
+
+
+def to_variant(frame, grayscale=False, downsample=1):
+    """Apply the grayscale / integer downsample options to one (H, W, 3) frame."""
+    img = frame.astype(np.float32)
+    if downsample > 1:
+        h = img.shape[0] // downsample * downsample
+        w = img.shape[1] // downsample * downsample
+        img = img[:h, :w].reshape(h // downsample, downsample, w // downsample, downsample, -1).mean(axis=(1, 3))
+    if grayscale:
+        img = (img @ GRAY_WEIGHTS)[..., None]
+    return np.clip(np.rint(img), 0, 255).astype(np.uint8)
+
+
+def variant_path(prefix, grayscale=False, downsample=1):
+    suffix = ''
+    if grayscale:
+        suffix += '_gray'
+    if downsample > 1:
+        suffix += '_x%d' % downsample
+    return prefix + suffix + '.npy'
+
+
+def index_path(prefix):
+    return prefix + '.index.npz'
+
+
+def pack_frames(src_dir, prefix, variants=((False, 1),), pattern=FRAME_PATTERN,
+                steps=None, timestamps=None, workers=8):
+    """
+    Pack the frames in `src_dir` into one .npy file per (grayscale, downsample)
+    variant, named from `prefix`, and write the shared index.
+
+    Frames are ordered by frame number. `steps` and `timestamps` default to the
+    frame order and the file modification times; pass arrays to record the
+    values from the trace instead. Returns the list of written tensor paths.
+    """
+    files = sorted(glob.glob(os.path.join(src_dir, pattern)), key=frame_number)
+    if not files:
+        raise ValueError('no frames matching %s in %s' % (pattern, src_dir))
+    n = len(files)
+    numbers = np.array([frame_number(f) for f in files], dtype=np.int64)
+
+    first = decode_png(files[0])
+    outputs = []
+    for grayscale, downsample in variants:
+        shape = to_variant(first, grayscale, downsample).shape
+        path = variant_path(prefix, grayscale, downsample)
+        outputs.append((grayscale, downsample, path,
+                        np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(n,) + shape)))
+
+    # Decode in a bounded window so memory stays flat for long episodes.
+    window = 4 * workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, n, window):
+            for i, frame in enumerate(pool.map(decode_png, files[start:start + window]), start):
+                for grayscale, downsample, _, out in outputs:
+                    out[i] = to_variant(frame, grayscale, downsample)
+    for _, _, _, out in outputs:
+        out.flush()
+
+    np.savez(index_path(prefix),
+             frame=numbers,
+             offset=np.arange(n, dtype=np.int64),
+             step=np.arange(n, dtype=np.int64) if steps is None else np.asarray(steps, dtype=np.int64),
+             timestamp=np.array([os.path.getmtime(f) for f in files]) if timestamps is None
+             else np.asarray(timestamps, dtype=np.float64))
+    return [path for _, _, path, _ in outputs]
+
+
+class FrameStore:
+    """
+    store = FrameStore('episode3', grayscale=True)
+    store[100:164]            # (64, H, W, 1) uint8 view backed by the file
+    store.frame(512)          # by frame number from the file name
+    """
+
+    def __init__(self, prefix, grayscale=False, downsample=1):
+        self.prefix = prefix
+        self.path = variant_path(prefix, grayscale, downsample)
+        self.frames = np.load(self.path, mmap_mode='r')
+        with np.load(index_path(prefix)) as index:
+            self.index = {k: index[k] for k in index.files}
+        self._order = np.argsort(self.index['frame'])
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, item):
+        return self.frames[item]
+
+    @property
+    def shape(self):
+        return self.frames.shape
+
+    def offsets(self, numbers):
+        """Row offsets for frame numbers; raises KeyError for unknown frames."""
+        numbers = np.atleast_1d(numbers)
+        sorted_frames = self.index['frame'][self._order]
+        pos = np.searchsorted(sorted_frames, numbers)
+        pos = np.clip(pos, 0, len(sorted_frames) - 1)
+        if np.any(sorted_frames[pos] != numbers):
+            raise KeyError('frames not in store: %s' % numbers[sorted_frames[pos] != numbers])
+        return self.index['offset'][self._order[pos]]
+
+    def frame(self, number):
+        return self.frames[self.offsets(number)[0]]
+
+    def batches(self, batch_size=64, start=0, stop=None):
+        """Yield (offset, frames) batches for streaming consumers."""
+        stop = len(self) if stop is None else stop
+        for i in range(start, stop, batch_size):
+            yield i, self.frames[i:min(i + batch_size, stop)]
@@ -0,0 +1,102 @@
+'''
+Vectorized projection of trace points onto a track centerline.
+
+Converts Cartesian trace positions into Frenet-frame coordinates: arc length s
+along the centerline, signed lateral offset d (positive to the left of the
+driving direction) and heading error relative to the centerline direction.
+'''
+import numpy as np
+
+# Upper bound on points x segments evaluated at once, keeps memory flat for long runs.
+CHUNK_ELEMENTS = 1 << 22
+
+
+def centerline_points(waypoints):
+    """
+    Centerline of a track as unique (N, 2) points of a closed loop.
+
+    Accepts either an (N, 2) centerline or a raw (N, 6) track array from
+    Analysis/tracks; repeated points and the closing duplicate are dropped.
+    """
+    pts = np.asarray(waypoints, dtype=float)[:, 0:2]
+    keep = np.ones(len(pts), dtype=bool)
+    keep[1:] = np.any(np.diff(pts, axis=0) != 0, axis=1)
+    pts = pts[keep]
+    if len(pts) > 1 and np.allclose(pts[0], pts[-1]):
+        pts = pts[:-1]
+    return pts
+
+
+def project_points(x, y, waypoints, heading=None):
+    """
+    Project points onto the closed centerline given by `waypoints`.
+
+    `x`, `y` must be in the same units as the waypoints (meters for the track
+    files) and `heading` in degrees, like the simtrace yaw column.
+
+    Returns a dict of arrays:
+        s              arc length of the projection from waypoint 0
+        d              signed lateral offset, positive left of the driving direction
+        segment        index of the centerline segment the point projects onto
+        heading_error  heading minus centerline direction in [-180, 180), if heading given
+    and 'track_length' (float).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    a = centerline_points(waypoints)
+    b = np.roll(a, -1, axis=0)
+    ab = b - a
+    seg_len_sq = np.sum(ab * ab, axis=1)
+    seg_len = np.sqrt(seg_len_sq)
+    cum = np.concatenate(([0.0], np.cumsum(seg_len)))
+
+    n_pts, n_seg = len(x), len(a)
+    segment = np.empty(n_pts, dtype=np.int64)
+    t_best = np.empty(n_pts)
+
+    rows = max(1, CHUNK_ELEMENTS // n_seg)
+    for start in range(0, n_pts, rows):
+        px = x[start:start + rows, None] - a[None, :, 0]
+        py = y[start:start + rows, None] - a[None, :, 1]
+        t = np.clip((px * ab[:, 0] + py * ab[:, 1]) / seg_len_sq, 0.0, 1.0)
+        dist_sq = (px - t * ab[:, 0]) ** 2 + (py - t * ab[:, 1]) ** 2
+        best = np.argmin(dist_sq, axis=1)
+        segment[start:start + rows] = best
+        t_best[start:start + rows] = t[np.arange(len(best)), best]
+
+    seg_a = a[segment]
+    seg_ab = ab[segment]
+    proj = seg_a + t_best[:, None] * seg_ab
+    rel_x = x - seg_a[:, 0]
+    rel_y = y - seg_a[:, 1]
+    side = np.sign(seg_ab[:, 0] * rel_y - seg_ab[:, 1] * rel_x)
+    d = side * np.hypot(x - proj[:, 0], y - proj[:, 1])
+
+    result = {
+        's': cum[segment] + t_best * seg_len[segment],
+        'd': d,
+        'segment': segment,
+        'track_length': cum[-1],
+    }
+    if heading is not None:
+        seg_heading = np.degrees(np.arctan2(seg_ab[:, 1], seg_ab[:, 0]))
+        err = np.asarray(heading, dtype=float) - seg_heading
+        result['heading_error'] = (err + 180.0) % 360.0 - 180.0
+    return result
+
+
+def add_frenet_columns(df, waypoints, x_col='x', y_col='y', heading_col='yaw', scale=1.0):
+    """
+    Add 's', 'd' and 'heading_error' columns to a trace DataFrame in one pass.
+
+    Use scale=100 for frames from log_analysis.convert_to_pandas, which stores
+    positions in centimeters; s and d are always in track units (meters).
+    """
+    heading = df[heading_col].values if heading_col in df else None
+    res = project_points(df[x_col].values / scale, df[y_col].values / scale, waypoints, heading)
+    df = df.copy()
+    df['s'] = res['s']
+    df['d'] = res['d']
+    if heading is not None:
+        df['heading_error'] = res['heading_error']
+    return df
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+'''
+Import-time budget for the modules used by headless parsing workers.
+
+Each module is imported in a fresh interpreter a few times and the median
+import time is compared with its budget. Every worker needs pandas, so budgets
+are the time a module may add on top of a bare `import pandas`, measured the
+same way on the same machine. Modules must also not pull in the plotting stack
+(matplotlib, shapely). Exits non-zero when a budget is broken.
+
+    python import_budget.py
+'''
+import os
+import subprocess
+import sys
+
+# Import every budget is measured against.
+BASELINE = 'pandas'
+# Milliseconds on top of the baseline import.
+BUDGETS_MS = {
+    'log_parsing': 50,
+    'log_analysis': 50,
+    'simtrace_loader': 50,
+    'metrics_reader': 50,
+    'model_bundle': 50,
+    'section_stats': 50,
+}
+
+PLOTTING_MODULES = ('matplotlib', 'shapely')
+
+_PROBE = '''
+import sys, time
+t = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t) * 1000
+print(ms, ','.join(m for m in {heavy!r} if m in sys.modules))
+'''
+
+
+def measure(module, runs=5):
+    """Median import time of `module` in ms and the plotting modules it loaded."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    heavy = ''
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=PLOTTING_MODULES)],
+                             cwd=here, capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        heavy = out[1] if len(out) > 1 else ''
+    times.sort()
+    return times[len(times) // 2], [m for m in heavy.split(',') if m]
+
+
+def main():
+    baseline, _ = measure(BASELINE)
+    print('%-18s %8.1f ms  baseline' % (BASELINE, baseline))
+    failed = 0
+    for module, budget in BUDGETS_MS.items():
+        try:
+            ms, heavy = measure(module)
+        except subprocess.CalledProcessError as e:
+            print('%-18s import failed: %s' % (module, e.stderr.strip().splitlines()[-1]))
+            failed += 1
+            continue
+        extra = ms - baseline
+        ok = extra <= budget and not heavy
+        failed += not ok
+        print('%-18s %8.1f ms  %+7.1f ms  budget +%-4d %s%s' % (
+            module, ms, extra, budget,
+            'ok' if ok else 'OVER', '  imports %s' % ', '.join(heavy) if heavy else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
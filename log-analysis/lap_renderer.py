@@ -0,0 +1,200 @@
+'''
+Streaming lap replay renderer.
+
+TrackCanvas rasterizes the track (surface, borders and centerline) into a
+uint8 RGB buffer once. render_frames then yields one frame per trace step:
+a copy of that background with the recent trail, the car position and
+heading, and optionally the camera frame the car saw pasted in a corner.
+write_video streams those frames to imageio (mp4 or gif) or to an ffmpeg
+process, so memory stays bounded by a single frame however long the lap is.
+'''
+import shutil
+import subprocess
+
+import numpy as np
+
+BACKGROUND = (255, 255, 255)
+SURFACE = (210, 210, 210)
+BORDER = (60, 60, 60)
+CENTERLINE = (0, 190, 220)
+TRAIL = (255, 150, 0)
+CAR = (220, 30, 30)
+
+
+def _inside_polygon(px, py, poly):
+    """Even-odd rule point-in-polygon for arrays of points."""
+    inside = np.zeros(px.shape, dtype=bool)
+    x0, y0 = poly[:, 0], poly[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    for ax, ay, bx, by in zip(x0, y0, x1, y1):
+        if ay == by:
+            continue
+        crosses = (ay > py) != (by > py)
+        x_at = ax + (py - ay) * (bx - ax) / (by - ay)
+        inside ^= crosses & (px < x_at)
+    return inside
+
+
+class TrackCanvas:
+    """
+    Track background and world-to-pixel transform for a raw (N, 6) track
+    array. Track y points up, image rows go down, so y is flipped.
+    """
+
+    def __init__(self, track, width=800, margin=20):
+        track = np.asarray(track, dtype=float)
+        self.center = track[:, 0:2]
+        self.left = track[:, 2:4]
+        self.right = track[:, 4:6]
+        pts = np.vstack([self.center, self.left, self.right])
+        self.min_xy = pts.min(axis=0)
+        span = pts.max(axis=0) - self.min_xy
+        self.margin = margin
+        self.scale = (width - 2 * margin) / span[0]
+        self.width = width
+        self.height = int(np.ceil(span[1] * self.scale)) + 2 * margin
+        self.background = self._rasterize()
+
+    def to_pixels(self, x, y):
+        """World coordinates (meters) to (column, row) pixel coordinates."""
+        col = (np.asarray(x) - self.min_xy[0]) * self.scale + self.margin
+        row = self.height - 1 - ((np.asarray(y) - self.min_xy[1]) * self.scale + self.margin)
+        return col, row
+
+    def _rasterize(self):
+        buf = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        buf[:] = BACKGROUND
+        rows, cols = np.mgrid[0:self.height, 0:self.width]
+        left = np.column_stack(self.to_pixels(*self.left.T))
+        right = np.column_stack(self.to_pixels(*self.right.T))
+        surface = _inside_polygon(cols + 0.5, rows + 0.5, left) ^ _inside_polygon(cols + 0.5, rows + 0.5, right)
+        buf[surface] = SURFACE
+        draw_polyline(buf, left, BORDER, 2)
+        draw_polyline(buf, right, BORDER, 2)
+        draw_polyline(buf, np.column_stack(self.to_pixels(*self.center.T)), CENTERLINE, 1)
+        return buf
+
+
+def draw_points(buf, cols, rows, color, radius=0):
+    """Set pixels (with a square of `radius` around each) to `color`, clipped to the buffer."""
+    h, w = buf.shape[:2]
+    cols = np.rint(np.asarray(cols)).astype(int).ravel()
+    rows = np.rint(np.asarray(rows)).astype(int).ravel()
+    if radius:
+        offs = np.arange(-radius, radius + 1)
+        dc, dr = np.meshgrid(offs, offs)
+        keep = dc * dc + dr * dr <= radius * radius
+        cols = (cols[:, None] + dc[keep][None, :]).ravel()
+        rows = (rows[:, None] + dr[keep][None, :]).ravel()
+    ok = (cols >= 0) & (cols < w) & (rows >= 0) & (rows < h)
+    buf[rows[ok], cols[ok]] = color
+
+
+def draw_polyline(buf, points, color, thickness=1, closed=False):
+    """Draw line segments between consecutive (col, row) points by dense sampling."""
+    points = np.asarray(points, dtype=float)
+    if closed:
+        points = np.vstack([points, points[:1]])
+    if len(points) < 2:
+        return
+    seg = np.diff(points, axis=0)
+    n = np.maximum(np.ceil(np.abs(seg).max(axis=1)).astype(int), 1)
+    idx = np.repeat(np.arange(len(seg)), n)
+    t = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / np.repeat(n, n)
+    samples = points[idx] + seg[idx] * t[:, None]
+    draw_points(buf, samples[:, 0], samples[:, 1], color, thickness // 2)
+
+
+def render_frames(canvas, x, y, heading, camera=None, trail=45, car_radius=5, inset_width=None):
+    """
+    Yield one uint8 (H, W, 3) frame per step of a lap.
+
+    `x`, `y` (meters) and `heading` (degrees) are per-step arrays, e.g. the
+    columns of one episode from simtrace_loader. `camera`, if given, is a
+    sequence with one (h, w, 3|1) uint8 camera frame per step (a FrameStore
+    slice or an aligned selection of it, or None entries) pasted top left.
+    The same buffer is reused between frames: copy it if you keep frames.
+    """
+    cols, rows = canvas.to_pixels(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    heading = np.radians(np.asarray(heading, dtype=float))
+    arrow = 4 * car_radius
+    buf = np.empty_like(canvas.background)
+
+    for i in range(len(cols)):
+        np.copyto(buf, canvas.background)
+        lo = max(0, i - trail)
+        if i > lo:
+            draw_polyline(buf, np.column_stack([cols[lo:i + 1], rows[lo:i + 1]]), TRAIL, 3)
+        tip = (cols[i] + arrow * np.cos(heading[i]), rows[i] - arrow * np.sin(heading[i]))
+        draw_polyline(buf, [(cols[i], rows[i]), tip], CAR, 3)
+        draw_points(buf, cols[i], rows[i], CAR, car_radius)
+
+        if camera is not None and camera[i] is not None:
+            img = np.asarray(camera[i])
+            if img.shape[-1] == 1:
+                img = np.repeat(img, 3, axis=-1)
+            if inset_width and img.shape[1] > inset_width:
+                step = int(np.ceil(img.shape[1] / inset_width))
+                img = img[::step, ::step]
+            h = min(img.shape[0], buf.shape[0])
+            w = min(img.shape[1], buf.shape[1])
+            buf[:h, :w] = img[:h, :w]
+        yield buf
+
+
+def write_video(frames, path, fps=15):
+    """
+    Stream frames to `path`. Uses imageio when installed (format from the
+    extension, e.g. .mp4 or .gif), else pipes raw RGB to an ffmpeg binary.
+    Returns the number of frames written.
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return 0
+
+    try:
+        import imageio
+    except ImportError:
+        imageio = None
+
+    count = 0
+    if imageio is not None:
+        writer = imageio.get_writer(path, fps=fps) if not path.endswith('.gif') \
+            else imageio.get_writer(path, mode='I', duration=1.0 / fps)
+        with writer:
+            writer.append_data(first)
+            count = 1
+            for frame in frames:
+                writer.append_data(frame)
+                count += 1
+        return count
+
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise ImportError('write_video needs imageio or an ffmpeg binary on PATH')
+    h, w = first.shape[:2]
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+           '-s', '%dx%d' % (w, h), '-r', str(fps), '-i', '-']
+    if not path.endswith('.gif'):
+        cmd += ['-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+    proc = subprocess.Popen(cmd + [path], stdin=subprocess.PIPE)
+    try:
+        proc.stdin.write(first.tobytes())
+        count = 1
+        for frame in frames:
+            proc.stdin.write(frame.tobytes())
+            count += 1
+    finally:
+        proc.stdin.close()
+        proc.wait()
+    if proc.returncode:
+        raise RuntimeError('ffmpeg exited with status %d' % proc.returncode)
+    return count
+
+
+def render_lap(track, episode_df, path, fps=15, camera=None, width=800):
+    """Render one episode of a simtrace frame (x, y in meters) to a video file."""
+    canvas = TrackCanvas(track, width=width)
+    return write_video(render_frames(canvas, episode_df['x'].values, episode_df['y'].values,
+                                     episode_df['yaw'].values, camera), path, fps)
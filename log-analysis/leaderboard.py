@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+'''
+Persistent best-laps leaderboard across runs.
+
+Completed laps (see run_report.episode_index) are recorded per track with
+their lap time, model id, source trace, iteration and episode. A lap is
+identified by (model id, source, iteration, episode), so re-ingesting the same
+traces does not add duplicates. Each track keeps only its top k laps in a
+heap, so ingesting a new trace costs O(laps * log k) and the fastest laps on a
+track are available without reloading any trace. The board is a small JSON
+file, rewritten atomically on save().
+
+    board = Leaderboard('reports/leaderboard.json')
+    board.ingest(load_simtrace(fname), track='Austin', model_id='5ee2d371')
+    board.save()
+    board.fastest('Austin', 10)
+
+    python leaderboard.py add intermediate_checkpoint/<model-id> --track Austin --evaluation
+    python leaderboard.py show --track Austin -n 10
+'''
+import argparse
+import heapq
+import json
+import os
+import sys
+
+import pandas as pd
+
+DEFAULT_PATH = os.path.join('reports', 'leaderboard.json')
+DEFAULT_K = 100
+FIELDS = ['lap_time', 'track', 'model_id', 'iteration', 'episode', 'source']
+
+
+class Leaderboard:
+
+    def __init__(self, path=DEFAULT_PATH, k=DEFAULT_K):
+        self.path = path
+        self.k = k
+        # track -> heap of (-lap_time, key) so the slowest kept lap is on top,
+        # and track -> {key: entry}.
+        self._heaps = {}
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.k = data.get('k', k)
+            for entries in data['tracks'].values():
+                for entry in entries:
+                    self.add(**entry)
+
+    @staticmethod
+    def _key(entry):
+        return (str(entry['model_id']), str(entry['source']), int(entry['iteration']), int(entry['episode']))
+
+    def add(self, lap_time, track, model_id, iteration, episode, source=None):
+        """Record one lap; returns True if it is in the track's top k."""
+        entry = {'lap_time': float(lap_time), 'track': track, 'model_id': str(model_id),
+                 'iteration': int(iteration), 'episode': int(episode), 'source': source}
+        key = self._key(entry)
+        heap = self._heaps.setdefault(track, [])
+        entries = self._entries.setdefault(track, {})
+        if key in entries:
+            if entries[key]['lap_time'] <= entry['lap_time']:
+                return False
+            # A faster time for the same lap (e.g. re-ingested with a fix):
+            # replace it and rebuild this track's heap.
+            entries[key] = entry
+            heap[:] = [(-e['lap_time'], k) for k, e in entries.items()]
+            heapq.heapify(heap)
+            return True
+        if len(heap) < self.k:
+            heapq.heappush(heap, (-entry['lap_time'], key))
+        elif -heap[0][0] > entry['lap_time']:
+            _, evicted = heapq.heappushpop(heap, (-entry['lap_time'], key))
+            del entries[evicted]
+        else:
+            return False
+        entries[key] = entry
+        return True
+
+    def ingest(self, df, track, model_id, source=None):
+        """Record every completed lap of a trace; returns the number that entered the board."""
+        from run_report import episode_index
+
+        episodes = episode_index(df)
+        laps = episodes[episodes['complete'] & episodes['lap_time'].notna()]
+        added = 0
+        for lap in laps.itertuples(index=False):
+            added += self.add(lap.lap_time, track, model_id, lap.iteration, lap.episode, source)
+        return added
+
+    def ingest_files(self, files, track, model_id, root=None):
+        """Ingest simtrace files; sources are recorded relative to `root` when given."""
+        from simtrace_loader import load_simtrace
+
+        return sum(self.ingest(load_simtrace(f), track, model_id,
+                               os.path.relpath(f, root) if root else os.path.basename(f))
+                   for f in files)
+
+    def tracks(self):
+        return sorted(self._heaps)
+
+    def fastest(self, track, n=10):
+        """The n fastest laps on `track`, fastest first."""
+        entries = heapq.nsmallest(n, self._entries.get(track, {}).values(),
+                                  key=lambda e: (e['lap_time'], self._key(e)))
+        return pd.DataFrame(entries, columns=FIELDS)
+
+    def save(self):
+        data = {'k': self.k, 'tracks': {t: sorted(self._entries[t].values(), key=lambda e: e['lap_time'])
+                                        for t in self.tracks()}}
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Best-laps leaderboard across runs.')
+    parser.add_argument('--board', default=DEFAULT_PATH, help='leaderboard JSON file')
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help='ingest the laps of a model folder, CSV or glob')
+    add.add_argument('target')
+    add.add_argument('--track', required=True)
+    add.add_argument('--model-id', default=None, help='default: the folder or file name')
+    add.add_argument('--evaluation', action='store_true', help='use evaluation traces of a model folder')
+    show = sub.add_parser('show', help='print the fastest laps')
+    show.add_argument('--track', default=None, help='default: every track')
+    show.add_argument('-n', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    board = Leaderboard(args.board)
+    if args.command == 'add':
+        from run_report import find_trace_files
+
+        files = find_trace_files(args.target, args.evaluation)
+        if not files:
+            print('no simtrace files found for %s' % args.target)
+            return 1
+        model_id = args.model_id or os.path.basename(os.path.normpath(args.target.split('*')[0]))
+        root = args.target if os.path.isdir(args.target) else None
+        added = board.ingest_files(files, args.track, model_id, root)
+        board.save()
+        print('%d laps from %d files entered the %s board' % (added, len(files), args.track))
+        return 0
+
+    for track in [args.track] if args.track else board.tracks():
+        print('%s\n%s\n' % (track, board.fastest(track, args.n).to_string(index=False)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+'''
+Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+
+# Plotting helpers of log_analysis. Imports matplotlib and shapely at load time,
+# so log_analysis only imports this module when one of these names is used.
+
+import numpy as np
+import matplotlib.pyplot as plt
+import math
+
+from matplotlib.collections import PatchCollection
+from matplotlib.patches import Rectangle
+
+from shapely.geometry import Point, Polygon
+from shapely.geometry.polygon import LinearRing, LineString
+from datetime import datetime
+
+
+def make_error_boxes(ax, xdata, ydata, xerror, yerror, facecolor='r',
+                     edgecolor='r', alpha=0.3):
+
+    # Create list for all the error patches
+    errorboxes = []
+
+    # Loop over data points; create box from errors at each point
+    for x, y, xe, ye in zip(xdata, ydata, xerror.T, yerror.T):
+        rect = Rectangle((x - xe[0], y - ye[0]), xe.sum(), ye.sum())
+        errorboxes.append(rect)
+
+    # Create patch collection with specified colour/alpha
+    pc = PatchCollection(errorboxes, facecolor=facecolor, alpha=alpha,
+                         edgecolor=edgecolor)
+
+    # Add collection to axes
+    ax.add_collection(pc)
+
+    # Plot errorbars
+    #artists = ax.errorbar(xdata, ydata, xerr=xerror, yerr=yerror,
+    #                      fmt='None', ecolor='k')
+
+    return 0
+
+def v_color(ob):
+    
+    COLOR = {
+        True: '#6699cc',
+        False: '#ffcc33'
+    }
+
+    return COLOR[ob.is_simple]
+
+
+def plot_coords(ax, ob):
+    x, y = ob.xy
+    ax.plot(x, y, '.', color='#999999', zorder=1)
+
+
+def plot_bounds(ax, ob):
+    x, y = zip(*list((p.x, p.y) for p in ob.boundary))
+    ax.plot(x, y, '.', color='#000000', zorder=1)
+
+def plot_line(ax, ob):
+    x, y = ob.xy
+    ax.plot(x, y, color='cyan', alpha=0.7, linewidth=3, solid_capstyle='round', zorder=2)
+
+def print_border(ax, waypoints, inner_border_waypoints, outer_border_waypoints):
+    line = LineString(waypoints)
+    plot_coords(ax, line)
+    plot_line(ax, line)
+
+    line = LineString(inner_border_waypoints)
+    plot_coords(ax, line)
+    plot_line(ax, line)
+
+    line = LineString(outer_border_waypoints)
+    plot_coords(ax, line)
+    plot_line(ax, line)
+def plot_grid_world(episode_df, inner, outer, scale=1.0, plot=True):
+    """
+    plot a scaled version of lap, along with throttle taken a each position
+    """
+    stats = []
+    outer = [(val[0] / scale, val[1] / scale) for val in outer]
+    inner = [(val[0] / scale, val[1] / scale) for val in inner]
+
+    max_x = int(np.max([val[0] for val in outer]))
+    max_y = int(np.max([val[1] for val in outer]))
+
+    print(max_x, max_y)
+    grid = np.zeros((max_x+1, max_y+1))
+
+    # create shapely ring for outter and inner
+    outer_polygon = Polygon(outer)
+    inner_polygon = Polygon(inner)
+
+    print('Outer polygon length = %.2f (meters)' % (outer_polygon.length / scale))
+    print('Inner polygon length = %.2f (meters)' % (inner_polygon.length / scale))
+
+    dist = 0.0
+    for ii in range(1, len(episode_df)):
+        dist += math.sqrt((episode_df['x'].iloc[ii] - episode_df['x'].iloc[ii-1])**2 + (episode_df['y'].iloc[ii] - episode_df['y'].iloc[ii-1])**2)
+    dist /= 100.0
+
+   
+    t0 = datetime.fromtimestamp(float(episode_df['timestamp'].iloc[0]))
+    t1 = datetime.fromtimestamp(float(episode_df['timestamp'].iloc[len(episode_df) - 1]))
+
+    lap_time = (t1-t0).total_seconds()
+
+    average_throttle = np.nanmean(episode_df['throttle'])
+    max_throttle = np.nanmax(episode_df['throttle'])
+    min_throttle = np.nanmin(episode_df['throttle'])
+    velocity = dist/lap_time
+
+    print('Distance, lap time = %.2f (meters), %.2f (sec)' % (dist, lap_time))
+    print('Average throttle, velocity = %.2f (Gazebo), %.2f (meters/sec)' % (average_throttle, velocity))
+
+    stats.append((dist, lap_time, velocity, average_throttle, min_throttle, max_throttle))
+
+
+    if plot == True:
+        
+        for y in range(max_y):
+            for x in range(max_x):
+                point = Point((x, y))
+
+                # this is the track
+                if (not inner_polygon.contains(point)) and (outer_polygon.contains(point)):
+                    grid[x][y] = -1.0
+
+                # find df slice that fits into this
+                df_slice = episode_df[(episode_df['x'] >= (x - 1) * scale) & (episode_df['x'] < x * scale) & \
+                                   (episode_df['y'] >= (y - 1) * scale) & (episode_df['y'] < y * scale)]
+
+                if len(df_slice) > 0:
+                    #average_throttle = np.nanmean(df_slice['throttle'])
+                    grid[x][y] = np.nanmean(df_slice['throttle'])
+
+        fig = plt.figure(figsize=(7,7))
+        imgplot = plt.imshow(grid)
+        plt.colorbar(orientation='vertical')
+        plt.title('Lap time (sec) = %.2f' %lap_time)
+        #plt.savefig('grid.png')
+
+    return lap_time, average_throttle, stats
@@ -0,0 +1,241 @@
+'''
+Incremental readers for training metrics that grow while a job runs.
+
+metrics/training/training-*.json is a single JSON document
+{"metrics": [{...}, {...}, ...]} that gets one record per episode, and the
+coach model-artifacts/*agent_0.csv gets one row per episode with 60+ mostly
+empty columns. Both readers remember how far they have read, parse only the
+new records on poll(), keep just the charted columns in compact numpy arrays
+and maintain per-iteration aggregates as records arrive, so refreshing a live
+dashboard does not re-read the whole file.
+
+The training metrics JSON also holds the evaluation episodes run between
+iterations (phase "evaluation", reusing the last training episode number);
+they are kept as separate per-iteration aggregates. Iterations count from 0,
+like the N-iteration.csv simtrace files: episodes 1-20 are iteration 0.
+'''
+import codecs
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+EPISODE_PER_ITER = 20
+
+AGENT_COLUMNS = ('Episode #', 'Training Iter', 'Episode Length', 'Shaped Training Reward',
+                 'Wall-Clock Time', 'Entropy/Mean', 'KL Divergence/Mean',
+                 'Policy Loss/Mean', 'Value Loss/Mean')
+
+
+class _GrowingArray:
+    """Append-only numpy array with amortized O(1) appends."""
+
+    def __init__(self, dtype, capacity=1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.data = np.resize(self.data, 2 * len(self.data))
+        self.data[self.size] = value
+        self.size += 1
+
+    def values(self):
+        return self.data[:self.size]
+
+
+class _IterationAggregates:
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, iteration, reward, completion, elapsed):
+        row = self.rows.get(iteration)
+        if row is None:
+            row = self.rows[iteration] = {'episodes': 0, 'reward_sum': 0.0, 'reward_max': -np.inf,
+                                          'completion_sum': 0.0, 'laps': 0, 'elapsed_sum': 0.0,
+                                          'best_lap_ms': np.nan}
+        row['episodes'] += 1
+        row['reward_sum'] += reward
+        row['reward_max'] = max(row['reward_max'], reward)
+        row['completion_sum'] += completion
+        row['elapsed_sum'] += elapsed
+        if completion >= 100:
+            row['laps'] += 1
+            if not elapsed >= row['best_lap_ms']:
+                row['best_lap_ms'] = elapsed
+
+    def frame(self):
+        df = pd.DataFrame.from_dict(self.rows, orient='index').sort_index()
+        df.index.name = 'iteration'
+        if len(df):
+            df['reward_mean'] = df['reward_sum'] / df['episodes']
+            df['completion_mean'] = df['completion_sum'] / df['episodes']
+            df['completion_rate'] = df['laps'] / df['episodes']
+            df['elapsed_mean_ms'] = df['elapsed_sum'] / df['episodes']
+        return df
+
+
+class TrainingMetricsReader:
+    """
+    reader = TrainingMetricsReader('metrics/training/training-....json')
+    new = reader.poll()        # number of records added since the last poll
+    reader.frame()             # projected columns as a DataFrame
+    reader.iterations()        # per-iteration aggregates
+    """
+
+    def __init__(self, path, episodes_per_iteration=EPISODE_PER_ITER):
+        self.path = path
+        self.episodes_per_iteration = episodes_per_iteration
+        self.reset()
+
+    def reset(self):
+        # Byte offset just past the last record parsed. The job rewrites the
+        # whole document, so everything after it (']}' or the next record) is
+        # read again on the next poll.
+        self._offset = 0
+        self._in_list = False
+        self._json = json.JSONDecoder()
+        self.status_codes = {}
+        self.phase_codes = {}
+        self.columns = {
+            'episode': _GrowingArray(np.int64),
+            'phase': _GrowingArray(np.int16),
+            'reward_score': _GrowingArray(np.float64),
+            'completion_percentage': _GrowingArray(np.float64),
+            'elapsed_time_in_milliseconds': _GrowingArray(np.float64),
+            'episode_status': _GrowingArray(np.int16),
+        }
+        self.aggregates = {}
+
+    def _add(self, record):
+        episode = record.get('episode', record.get('trial', self.columns['episode'].size + 1))
+        reward = float(record.get('reward_score', np.nan))
+        completion = float(record.get('completion_percentage', np.nan))
+        elapsed = float(record.get('elapsed_time_in_milliseconds', np.nan))
+        status = self.status_codes.setdefault(record.get('episode_status'), len(self.status_codes))
+        phase = record.get('phase', 'training')
+
+        self.columns['episode'].append(episode)
+        self.columns['phase'].append(self.phase_codes.setdefault(phase, len(self.phase_codes)))
+        self.columns['reward_score'].append(reward)
+        self.columns['completion_percentage'].append(completion)
+        self.columns['elapsed_time_in_milliseconds'].append(elapsed)
+        self.columns['episode_status'].append(status)
+        if phase not in self.aggregates:
+            self.aggregates[phase] = _IterationAggregates()
+        self.aggregates[phase].add((episode - 1) // self.episodes_per_iteration, reward, completion, elapsed)
+
+    def poll(self):
+        """Parse records added since the last call. Returns how many were added."""
+        size = os.path.getsize(self.path)
+        if size < self._offset:
+            # File was replaced with a shorter one, start over.
+            self.reset()
+        if size == self._offset:
+            return 0
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        # A multi-byte character cut off at the end is left for the next poll.
+        text = codecs.getincrementaldecoder('utf-8')().decode(chunk)
+
+        pos = 0
+        if not self._in_list:
+            start = text.find('[')
+            if start < 0:
+                return 0
+            pos = start + 1
+            self._in_list = True
+
+        added = 0
+        consumed = pos
+        while True:
+            # Resync on the next record, skipping separators, which differ
+            # with the writer's json.dump options.
+            start = text.find('{', pos)
+            if start < 0:
+                break   # ']}' closing the list, more records not written yet
+            try:
+                record, end = self._json.raw_decode(text, start)
+            except ValueError:
+                break   # record not completely written yet
+            self._add(record)
+            added += 1
+            pos = consumed = end
+        self._offset += len(text[:consumed].encode('utf-8'))
+        return added
+
+    def frame(self):
+        data = {name: col.values() for name, col in self.columns.items()}
+        statuses = [None] * len(self.status_codes)
+        for name, code in self.status_codes.items():
+            statuses[code] = name
+        data['episode_status'] = pd.Categorical.from_codes(data['episode_status'], statuses) \
+            if statuses else data['episode_status']
+        phases = sorted(self.phase_codes, key=self.phase_codes.get)
+        data['phase'] = pd.Categorical.from_codes(data['phase'], phases) if phases else data['phase']
+        return pd.DataFrame(data)
+
+    def iterations(self, phase='training'):
+        """Per-iteration aggregates of one phase ('training' or 'evaluation')."""
+        aggregates = self.aggregates.get(phase)
+        return aggregates.frame() if aggregates else _IterationAggregates().frame()
+
+
+class AgentCsvReader:
+    """
+    Incremental reader for the coach worker_0...agent_0.csv, keeping only
+    `columns`. Empty cells become NaN.
+    """
+
+    def __init__(self, path, columns=AGENT_COLUMNS):
+        self.path = path
+        self.wanted = tuple(columns)
+        self.reset()
+
+    def reset(self):
+        self._offset = 0
+        self._partial = b''
+        self._index = None
+        self.columns = {c: _GrowingArray(np.float64) for c in self.wanted}
+
+    def poll(self):
+        size = os.path.getsize(self.path)
+        if size < self._offset:
+            self.reset()
+        if size == self._offset:
+            return 0
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        self._offset += len(chunk)
+
+        data = self._partial + chunk
+        last_newline = data.rfind(b'\n')
+        if last_newline < 0:
+            self._partial = data
+            return 0
+        self._partial = data[last_newline + 1:]
+        lines = data[:last_newline].decode('utf-8').splitlines()
+
+        rows = csv.reader(lines)
+        if self._index is None:
+            header = next(rows)
+            self._index = [(c, header.index(c)) for c in self.wanted if c in header]
+
+        added = 0
+        for row in rows:
+            for name, i in self._index:
+                value = row[i] if i < len(row) else ''
+                self.columns[name].append(float(value) if value else np.nan)
+            added += 1
+        return added
+
+    def frame(self):
+        return pd.DataFrame({name: col.values() for name, col in self.columns.items()
+                             if self._index and name in dict(self._index)})
@@ -0,0 +1,199 @@
+'''
+Loader for the files of one model folder.
+
+Model folders (intermediate_checkpoint/<id>/, downloaded_model/<id>/) share a
+layout:
+
+    sim-trace/training/training-simtrace/N-iteration.csv
+    sim-trace/evaluation/<run>/evaluation-simtrace/N-iteration.csv
+    metrics/training/training-*.json
+    metrics/evaluation/evaluation-*.json
+    model-artifacts/*agent_0.csv
+    model-artifacts/model_metadata.json (or model/model_metadata.json)
+
+ModelBundle discovers these files once and loads each of them on first access.
+Iteration CSVs are read in parallel and concatenated in iteration order
+(0, 1, 2, ..., 10), not lexical order. Parsed files are kept in a cache shared
+by all bundles, keyed by path, size and modification time.
+'''
+import glob
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+_CACHE = {}
+
+
+def natural_key(path):
+    """Sort key that orders embedded numbers numerically: 2-iteration before 10-iteration."""
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+def iteration_number(path):
+    m = re.match(r'(\d+)-iteration', os.path.basename(path))
+    return int(m.group(1)) if m else None
+
+
+def _cached(path, loader):
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, loader.__name__)
+    if key not in _CACHE:
+        _CACHE[key] = loader(path)
+    return _CACHE[key]
+
+
+def clear_cache():
+    _CACHE.clear()
+
+
+def _read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _read_metrics(path):
+    return pd.DataFrame(_read_json(path)['metrics'])
+
+
+def _read_trace(path):
+    return pd.read_csv(path)
+
+
+def _read_agent_csv(path):
+    return pd.read_csv(path).dropna(axis=1, how='all')
+
+
+def read_iterations(files, reader=_read_trace, workers=8):
+    """
+    Read iteration CSVs in parallel and concatenate them in iteration order,
+    adding an 'iteration' column taken from the file name.
+    """
+    files = sorted(files, key=natural_key)
+    if not files:
+        return pd.DataFrame()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(lambda f: _cached(f, reader), files))
+    out = []
+    for fname, df in zip(files, frames):
+        df = df.copy()
+        df.insert(0, 'iteration', iteration_number(fname))
+        out.append(df)
+    return pd.concat(out, ignore_index=True)
+
+
+class ModelBundle:
+    """
+    bundle = ModelBundle('intermediate_checkpoint/5ee2d371-...')
+    bundle.metadata, bundle.training_trace, bundle.training_metrics, ...
+    """
+
+    def __init__(self, root, workers=8):
+        self.root = root
+        self.model_id = os.path.basename(os.path.normpath(root))
+        self.workers = workers
+        self._loaded = {}
+
+    def _glob(self, *parts):
+        return sorted(glob.glob(os.path.join(self.root, *parts)), key=natural_key)
+
+    def _lazy(self, name, build):
+        if name not in self._loaded:
+            self._loaded[name] = build()
+        return self._loaded[name]
+
+    @property
+    def training_trace_files(self):
+        return self._glob('sim-trace', 'training', 'training-simtrace', '*-iteration.csv')
+
+    @property
+    def evaluation_runs(self):
+        """Evaluation run ids, each with its own evaluation-simtrace folder."""
+        return [os.path.basename(os.path.dirname(p))
+                for p in self._glob('sim-trace', 'evaluation', '*', 'evaluation-simtrace')]
+
+    def evaluation_trace_files(self, run):
+        return self._glob('sim-trace', 'evaluation', run, 'evaluation-simtrace', '*-iteration.csv')
+
+    @property
+    def training_metrics_files(self):
+        return self._glob('metrics', 'training', '*.json')
+
+    @property
+    def evaluation_metrics_files(self):
+        return self._glob('metrics', 'evaluation', '*.json')
+
+    @property
+    def metadata_file(self):
+        for parts in (('model-artifacts', 'model_metadata.json'), ('model', 'model_metadata.json'),
+                      ('model_metadata.json',)):
+            path = os.path.join(self.root, *parts)
+            if os.path.exists(path):
+                return path
+        return None
+
+    @property
+    def agent_csv_file(self):
+        files = self._glob('model-artifacts', '*agent_0.csv')
+        return files[0] if files else None
+
+    @property
+    def log_files(self):
+        """Downloaded SageMaker/RoboMaker logs, e.g. logs/evaluation/*.log."""
+        return self._glob('logs', '*', '*.log')
+
+    @property
+    def checkpoint_files(self):
+        return self._glob('model', '*.ckpt.*')
+
+    @property
+    def metadata(self):
+        path = self.metadata_file
+        return _cached(path, _read_json) if path else None
+
+    @property
+    def training_trace(self):
+        return self._lazy('training_trace', lambda: read_iterations(
+            self.training_trace_files, workers=self.workers))
+
+    def evaluation_trace(self, run=None):
+        runs = [run] if run else self.evaluation_runs
+        return self._lazy(('evaluation_trace', run), lambda: pd.concat(
+            [read_iterations(self.evaluation_trace_files(r), workers=self.workers).assign(run=r)
+             for r in runs], ignore_index=True) if runs else pd.DataFrame())
+
+    @property
+    def training_metrics(self):
+        return self._lazy('training_metrics', lambda: pd.concat(
+            [_cached(f, _read_metrics) for f in self.training_metrics_files],
+            ignore_index=True) if self.training_metrics_files else pd.DataFrame())
+
+    @property
+    def evaluation_metrics(self):
+        return self._lazy('evaluation_metrics', lambda: pd.concat(
+            [_cached(f, _read_metrics).assign(file=os.path.basename(f))
+             for f in self.evaluation_metrics_files],
+            ignore_index=True) if self.evaluation_metrics_files else pd.DataFrame())
+
+    @property
+    def agent_metrics(self):
+        """The coach agent CSV with all-empty columns dropped."""
+        path = self.agent_csv_file
+        return _cached(path, _read_agent_csv) if path else None
+
+    def describe(self):
+        return {
+            'model_id': self.model_id,
+            'root': self.root,
+            'training_iterations': len(self.training_trace_files),
+            'evaluation_runs': self.evaluation_runs,
+            'training_metrics': [os.path.basename(f) for f in self.training_metrics_files],
+            'evaluation_metrics': [os.path.basename(f) for f in self.evaluation_metrics_files],
+            'metadata': self.metadata_file,
+            'agent_csv': self.agent_csv_file,
+            'logs': [os.path.basename(f) for f in self.log_files],
+            'checkpoints': [os.path.basename(f) for f in self.checkpoint_files],
+        }
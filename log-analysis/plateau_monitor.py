@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+'''
+Online plateau / early-stop monitor for training runs.
+
+PlateauMonitor is fed one row of per-iteration aggregates at a time, from any
+of the per-iteration tables in this folder (trace_aggregator.iterations(),
+run_report.lap_metrics(), metrics_reader.TrainingMetricsReader.iterations()).
+For every tracked metric it keeps the best value so far and a rolling linear
+regression over the last `window` iterations, both updated in O(1). A metric
+has plateaued when it has not beaten its best by `min_delta` for `patience`
+iterations and its recent trend is not significantly improving. When every
+metric has plateaued the monitor says stop, with the reasons.
+
+    monitor = PlateauMonitor()
+    for iteration, row in reader.iterations().iterrows():
+        decision = monitor.update(row, iteration)
+    if decision.stop:
+        print(decision.reasons)
+
+    python plateau_monitor.py metrics/training/training-<id>.json --follow 60
+'''
+import argparse
+import sys
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+# Metric -> (columns it may be found under with a scale factor, +1 if higher is better).
+METRICS = {
+    'progress': ((('progress_mean', 1.0), ('completion_mean', 1.0)), 1),
+    'completion_rate': ((('completion_rate', 1.0),), 1),
+    'reward': ((('reward_mean', 1.0),), 1),
+    'lap_time': ((('best_lap_time', 1.0), ('best_lap_ms', 1e-3)), -1),
+}
+
+DEFAULT_PARAMS = {
+    'metrics': ('progress', 'completion_rate', 'reward', 'lap_time'),
+    'window': 10,              # iterations in the rolling trend
+    'patience': 15,            # iterations without a new best
+    'min_iterations': 20,      # never stop before this many iterations
+    'min_delta': {             # smallest change that counts as a new best
+        'progress': 1.0,
+        'completion_rate': 0.02,
+        'reward': 0.01,        # relative to the best reward
+        'lap_time': 0.1,       # seconds
+    },
+    'relative_delta': ('reward',),
+    't_threshold': 2.0,        # slope t-statistic that counts as still improving
+}
+
+Decision = namedtuple('Decision', 'stop iteration reasons')
+
+
+class RollingTrend:
+    """Least-squares slope of the last `window` (x, y) points, O(1) per update."""
+
+    def __init__(self, window):
+        self.points = deque(maxlen=window)
+        self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+
+    def _add(self, x, y, sign):
+        self.sx += sign * x
+        self.sy += sign * y
+        self.sxx += sign * x * x
+        self.sxy += sign * x * y
+        self.syy += sign * y * y
+
+    def push(self, x, y):
+        if len(self.points) == self.points.maxlen:
+            self._add(*self.points[0], -1)
+        self.points.append((x, y))
+        self._add(x, y, 1)
+
+    def __len__(self):
+        return len(self.points)
+
+    def slope(self):
+        """(slope, t statistic of the slope); NaN with fewer than 3 points."""
+        n = len(self.points)
+        if n < 3:
+            return np.nan, np.nan
+        sxx = self.sxx - self.sx * self.sx / n
+        sxy = self.sxy - self.sx * self.sy / n
+        syy = self.syy - self.sy * self.sy / n
+        if sxx <= 0:
+            return np.nan, np.nan
+        slope = sxy / sxx
+        resid = max(syy - slope * sxy, 0.0) / (n - 2)
+        if resid == 0:
+            return slope, np.inf * np.sign(slope) if slope else 0.0
+        return slope, slope / np.sqrt(resid / sxx)
+
+
+class _MetricState:
+
+    def __init__(self, name, window, min_delta, relative):
+        self.name = name
+        self.direction = METRICS[name][1]
+        self.min_delta = min_delta
+        self.relative = relative
+        self.best = None
+        self.best_iteration = None
+        self.trend = RollingTrend(window)
+
+    def update(self, iteration, value):
+        self.trend.push(iteration, self.direction * value)
+        delta = self.min_delta * abs(self.best) if self.relative and self.best is not None else self.min_delta
+        if self.best is None or self.direction * (value - self.best) >= delta:
+            self.best = value
+            self.best_iteration = iteration
+
+
+class PlateauMonitor:
+
+    def __init__(self, params=None):
+        p = dict(DEFAULT_PARAMS)
+        p.update(params or {})
+        self.params = p
+        self.metrics = {name: _MetricState(name, p['window'], p['min_delta'].get(name, 0.0),
+                                           name in p['relative_delta'])
+                        for name in p['metrics']}
+        self.iterations = 0
+        self.last_iteration = None
+        self.decision = Decision(False, None, [])
+
+    @staticmethod
+    def _value(row, name):
+        for column, scale in METRICS[name][0]:
+            if column in row:
+                value = row[column]
+                if value is not None and not np.isnan(value):
+                    return float(value) * scale
+                return None
+        return None
+
+    def update(self, row, iteration=None):
+        """
+        Add one iteration (dict or Series of aggregates) and return a Decision.
+        Metrics missing from the row, or NaN (e.g. no lap completed yet), are
+        skipped for that iteration.
+        """
+        if iteration is None:
+            iteration = row.get('iteration', self.iterations)
+        self.iterations += 1
+        self.last_iteration = iteration
+        for name, state in self.metrics.items():
+            value = self._value(row, name)
+            if value is not None:
+                state.update(iteration, value)
+        self.decision = self._decide(iteration)
+        return self.decision
+
+    def _decide(self, iteration):
+        p = self.params
+        reasons = []
+        plateaued = 0
+        for name, state in self.metrics.items():
+            if state.best is None:
+                reasons.append('%s: no data' % name)
+                plateaued += 1
+                continue
+            stale = iteration - state.best_iteration
+            slope, t = state.trend.slope()
+            improving = not np.isnan(t) and t >= p['t_threshold']
+            if stale >= p['patience'] and not improving:
+                plateaued += 1
+                reasons.append('%s: best %.4g at iteration %s, %d iterations ago; trend %+.3g/iter (t=%.2f)'
+                               % (name, state.best, state.best_iteration, stale,
+                                  state.direction * slope, t))
+        stop = self.iterations >= p['min_iterations'] and plateaued == len(self.metrics) \
+            and any(s.best is not None for s in self.metrics.values())
+        return Decision(stop, iteration, reasons if stop else [])
+
+    def feed(self, iterations):
+        """Feed a per-iteration DataFrame (indexed by iteration) and return the last Decision."""
+        for iteration, row in iterations.iterrows():
+            self.update(row, iteration)
+        return self.decision
+
+    def status(self):
+        """Current best, staleness and trend per metric, as a dict of dicts."""
+        out = {}
+        for name, state in self.metrics.items():
+            slope, t = state.trend.slope()
+            out[name] = {'best': state.best, 'best_iteration': state.best_iteration,
+                         'stale': None if state.best is None else self.last_iteration - state.best_iteration,
+                         'slope': state.direction * slope, 't': t}
+        return out
+
+
+def main(argv=None):
+    from metrics_reader import TrainingMetricsReader
+
+    parser = argparse.ArgumentParser(description='Watch a training metrics JSON and report plateaus.')
+    parser.add_argument('metrics', help='training metrics JSON file')
+    parser.add_argument('--follow', type=float, default=None, metavar='SECONDS',
+                        help='keep polling the file every SECONDS until a stop is signalled')
+    parser.add_argument('--patience', type=int, default=DEFAULT_PARAMS['patience'])
+    parser.add_argument('--window', type=int, default=DEFAULT_PARAMS['window'])
+    args = parser.parse_args(argv)
+
+    reader = TrainingMetricsReader(args.metrics)
+    monitor = PlateauMonitor({'patience': args.patience, 'window': args.window})
+    done = -1
+    while True:
+        reader.poll()
+        iterations = reader.iterations()
+        # The last iteration may still be filling up; only feed finished ones
+        # unless the file is not being followed.
+        if args.follow and len(iterations):
+            iterations = iterations.iloc[:-1]
+        new = iterations[iterations.index > done]
+        if len(new):
+            decision = monitor.feed(new)
+            done = new.index[-1]
+            print('iteration %s: %s' % (decision.iteration, 'STOP' if decision.stop else 'continue'))
+            for reason in decision.reasons:
+                print('  ' + reason)
+            if decision.stop:
+                return 0
+        if not args.follow:
+            return 0
+        time.sleep(args.follow)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
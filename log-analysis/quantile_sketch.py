@@ -0,0 +1,265 @@
+'''
+Mergeable quantile sketches for reward, speed and progress distributions.
+
+QuantileSketch keeps counts in logarithmically spaced buckets (as in DDSketch):
+any quantile is returned with a bounded relative error (1% by default) using a
+few hundred integers, whatever the number of values. Updates take a whole
+array at once, sketches with the same accuracy merge by adding counts, and
+they save to a small .npz file.
+
+SketchSet holds one sketch per (metric, group), e.g. per iteration, action or
+track section, and is fed DataFrame chunks straight from the log readers:
+
+    sketches = SketchSet(('reward', 'throttle', 'progress'), by='iteration')
+    for chunk in iter_simtrace_chunks(fname):
+        sketches.update(chunk)
+    sketches.save('sketches.npz')
+    sketches.bands('reward', (0.1, 0.5, 0.9))
+'''
+import ast
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ACCURACY = 0.01
+# Values closer to zero than this are counted in the zero bucket.
+MIN_MAGNITUDE = 1e-9
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class _Store:
+    """Dense bucket counts for keys offset..offset+len(counts)-1."""
+
+    def __init__(self, counts=None, offset=0):
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.offset = int(offset)
+
+    def add(self, keys, weights=None):
+        if len(keys) == 0:
+            return
+        lo, hi = int(keys.min()), int(keys.max())
+        self._extend(lo, hi)
+        self.counts += np.bincount(keys - self.offset, weights=weights,
+                                   minlength=len(self.counts)).astype(np.int64)
+
+    def _extend(self, lo, hi):
+        if len(self.counts) == 0:
+            self.counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            self.offset = lo
+            return
+        new_lo = min(lo, self.offset)
+        new_hi = max(hi, self.offset + len(self.counts) - 1)
+        if new_lo == self.offset and new_hi == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_hi - new_lo + 1, dtype=np.int64)
+        counts[self.offset - new_lo:self.offset - new_lo + len(self.counts)] = self.counts
+        self.counts, self.offset = counts, new_lo
+
+    def merge(self, other):
+        if len(other.counts) == 0:
+            return
+        self._extend(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch. Each nonzero value x falls in bucket
+    ceil(log_gamma(|x|)) of the positive or negative store, with
+    gamma = (1 + accuracy) / (1 - accuracy).
+    """
+
+    def __init__(self, accuracy=DEFAULT_ACCURACY):
+        if not 0 < accuracy < 1:
+            raise ValueError('accuracy must be in (0, 1)')
+        self.accuracy = float(accuracy)
+        self.gamma = (1 + self.accuracy) / (1 - self.accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive = _Store()
+        self.negative = _Store()
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _keys(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def update(self, values):
+        """Add an array of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        pos = values > MIN_MAGNITUDE
+        neg = values < -MIN_MAGNITUDE
+        self.positive.add(self._keys(values[pos]))
+        self.negative.add(self._keys(-values[neg]))
+        self.zeros += int(len(values) - pos.sum() - neg.sum())
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError('can only merge sketches with the same accuracy')
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def quantile(self, q):
+        """Estimated quantile(s) for q in [0, 1]; NaN for an empty sketch."""
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        if self.count == 0:
+            out = np.full(len(qs), np.nan)
+            return out if np.ndim(q) else out[0]
+
+        # Buckets in ascending value order: negative store from the largest
+        # magnitude down, then zeros, then the positive store.
+        neg_keys = self.negative.offset + np.arange(len(self.negative.counts))
+        pos_keys = self.positive.offset + np.arange(len(self.positive.counts))
+        values = np.concatenate([-self._value(neg_keys[::-1]), [0.0], self._value(pos_keys)])
+        counts = np.concatenate([self.negative.counts[::-1], [self.zeros], self.positive.counts])
+        cum = np.cumsum(counts)
+
+        rank = np.clip(qs, 0, 1) * (self.count - 1)
+        idx = np.searchsorted(cum, rank, side='right')
+        out = np.clip(values[np.minimum(idx, len(values) - 1)], self.min, self.max)
+        out[qs <= 0] = self.min
+        out[qs >= 1] = self.max
+        return out if np.ndim(q) else out[0]
+
+    def to_arrays(self, prefix=''):
+        """Flat dict of arrays for np.savez."""
+        return {
+            prefix + 'header': np.array([self.accuracy, self.zeros, self.count, self.total,
+                                         self.min, self.max, self.positive.offset, self.negative.offset]),
+            prefix + 'positive': self.positive.counts,
+            prefix + 'negative': self.negative.counts,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=''):
+        accuracy, zeros, count, total, vmin, vmax, pos_offset, neg_offset = arrays[prefix + 'header']
+        sketch = cls(accuracy)
+        sketch.zeros, sketch.count, sketch.total = int(zeros), int(count), float(total)
+        sketch.min, sketch.max = float(vmin), float(vmax)
+        sketch.positive = _Store(arrays[prefix + 'positive'], pos_offset)
+        sketch.negative = _Store(arrays[prefix + 'negative'], neg_offset)
+        return sketch
+
+    def save(self, path):
+        np.savez_compressed(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls.from_arrays(arrays)
+
+
+class SketchSet:
+    """
+    One QuantileSketch per (metric, group). `by` names the grouping column(s)
+    ('iteration', 'action', a section column, ...) or is None for a single
+    group over everything.
+    """
+
+    def __init__(self, metrics=('reward', 'throttle', 'progress'), by='iteration',
+                 accuracy=DEFAULT_ACCURACY):
+        self.metrics = tuple(metrics)
+        self.by = by
+        self.accuracy = float(accuracy)
+        self.sketches = {}
+
+    def _sketch(self, metric, group):
+        key = (metric, group)
+        if key not in self.sketches:
+            self.sketches[key] = QuantileSketch(self.accuracy)
+        return self.sketches[key]
+
+    def update(self, df, groups=None):
+        """
+        Add a chunk. `groups` optionally gives the group of every row (e.g.
+        section ids from section_stats) instead of the `by` column(s).
+        """
+        if len(df) == 0:
+            return self
+        if groups is None and self.by is None:
+            groups = np.zeros(len(df), dtype=np.int64)
+        keys = self.by if groups is None else pd.Series(np.asarray(groups), index=df.index)
+        for group, rows in df.groupby(keys, sort=False, observed=True).indices.items():
+            group = tuple(_plain(g) for g in group) if isinstance(group, tuple) else _plain(group)
+            for metric in self.metrics:
+                self._sketch(metric, group).update(df[metric].values[rows])
+        return self
+
+    def merge(self, other):
+        if other.metrics != self.metrics or other.accuracy != self.accuracy:
+            raise ValueError('can only merge sketch sets with the same metrics and accuracy')
+        for (metric, group), sketch in other.sketches.items():
+            self._sketch(metric, group).merge(sketch)
+        return self
+
+    def groups(self, metric=None):
+        return sorted({g for m, g in self.sketches if metric is None or m == metric})
+
+    def quantile(self, metric, q, group=None):
+        sketch = self.sketches.get((metric, 0 if group is None and self.by is None else group))
+        if sketch is None:
+            raise KeyError((metric, group))
+        return sketch.quantile(q)
+
+    def bands(self, metric, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        """DataFrame of quantiles, count and mean per group, e.g. for percentile band plots."""
+        rows = {}
+        for group in self.groups(metric):
+            sketch = self.sketches[(metric, group)]
+            row = dict(zip(['p%g' % (q * 100) for q in quantiles], sketch.quantile(quantiles)))
+            row.update(count=sketch.count, mean=sketch.mean)
+            rows[group] = row
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def save(self, path):
+        """Save all sketches into one compressed .npz file."""
+        arrays = {}
+        index = []
+        for i, ((metric, group), sketch) in enumerate(sorted(self.sketches.items(), key=lambda kv: str(kv[0]))):
+            arrays.update(sketch.to_arrays('s%d_' % i))
+            index.append((metric, repr(group)))
+        by = self.by if isinstance(self.by, str) or self.by is None else list(self.by)
+        np.savez_compressed(path, index=np.array(index, dtype=str).reshape(-1, 2),
+                            metrics=np.array(self.metrics, dtype=str),
+                            by=np.array(repr(by)), accuracy=np.array(self.accuracy), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            sketches = cls(tuple(arrays['metrics']), ast.literal_eval(str(arrays['by'])),
+                           float(arrays['accuracy']))
+            for i, (metric, group) in enumerate(arrays['index']):
+                sketches.sketches[(str(metric), ast.literal_eval(str(group)))] = \
+                    QuantileSketch.from_arrays(arrays, 's%d_' % i)
+        return sketches
@@ -0,0 +1,145 @@
+'''
+Aggregate rasterizer for whole-run trace plots.
+
+Instead of drawing every trace point as a matplotlib marker, points are binned
+onto a pixel grid aligned to the track bounds and reduced per pixel (count,
+sum, mean, min or max of a value) with bincount, in one vectorized pass per
+chunk. The result is a small image that overlays on the track borders, so the
+cost of plotting does not grow with the number of steps.
+
+    acc = RasterAccumulator(track_extent(track), resolution=0.05)
+    for df in chunks:
+        acc.add(df['x'], df['y'], df['reward'])
+    plot_raster(ax, acc.image('mean'), acc.grid_extent, track=track)
+'''
+import numpy as np
+
+REDUCTIONS = ('count', 'sum', 'mean', 'min', 'max')
+
+
+def track_extent(track, margin=0.3):
+    """(xmin, xmax, ymin, ymax) of a raw (N, 6) track array plus a margin in meters."""
+    pts = np.asarray(track, dtype=float)[:, 0:6].reshape(-1, 2)
+    lo = pts.min(axis=0) - margin
+    hi = pts.max(axis=0) + margin
+    return (lo[0], hi[0], lo[1], hi[1])
+
+
+class RasterAccumulator:
+    """
+    Per-pixel count, sum, min and max, updated chunk by chunk. Memory is fixed
+    by the grid size; accumulators over the same grid can be merged.
+    """
+
+    def __init__(self, extent, resolution=0.05):
+        self.extent = tuple(float(v) for v in extent)
+        self.resolution = float(resolution)
+        xmin, xmax, ymin, ymax = self.extent
+        self.width = max(1, int(np.ceil((xmax - xmin) / self.resolution)))
+        self.height = max(1, int(np.ceil((ymax - ymin) / self.resolution)))
+        size = self.width * self.height
+        self.count = np.zeros(size, dtype=np.int64)
+        self.total = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    @property
+    def grid_extent(self):
+        """
+        (xmin, xmax, ymin, ymax) covered by the pixel grid, which rounds the
+        extent up to whole pixels; pass this to imshow/plot_raster.
+        """
+        xmin, _, ymin, _ = self.extent
+        return (xmin, xmin + self.width * self.resolution, ymin, ymin + self.height * self.resolution)
+
+    def _cells(self, x, y):
+        xmin, xmax, ymin, ymax = self.extent
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        ok = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+        # The extent is closed: points on xmax/ymax fall in the last column/row.
+        col = np.floor((np.where(ok, x, xmin) - xmin) / self.resolution).astype(np.int64)
+        row = np.floor((np.where(ok, y, ymin) - ymin) / self.resolution).astype(np.int64)
+        np.minimum(col, self.width - 1, out=col)
+        np.minimum(row, self.height - 1, out=row)
+        return row * self.width + col, ok
+
+    def add(self, x, y, values=None):
+        """Add points; points outside the closed extent and NaN values are ignored."""
+        cells, ok = self._cells(x, y)
+        if values is None:
+            self.count += np.bincount(cells[ok], minlength=len(self.count))
+            return self
+        values = np.asarray(values, dtype=float)
+        ok &= ~np.isnan(values)
+        cells, values = cells[ok], values[ok]
+        size = len(self.count)
+        self.count += np.bincount(cells, minlength=size)
+        self.total += np.bincount(cells, weights=values, minlength=size)
+
+        # Fancy assignment keeps the last write per cell, so writing values in
+        # ascending order leaves the max and in descending order the min.
+        order = np.argsort(values, kind='stable')
+        chunk_max = np.full(size, -np.inf)
+        chunk_max[cells[order]] = values[order]
+        np.maximum(self.max, chunk_max, out=self.max)
+        chunk_min = np.full(size, np.inf)
+        chunk_min[cells[order[::-1]]] = values[order[::-1]]
+        np.minimum(self.min, chunk_min, out=self.min)
+        return self
+
+    def merge(self, other):
+        if other.extent != self.extent or other.resolution != self.resolution:
+            raise ValueError('can only merge rasters over the same grid')
+        self.count += other.count
+        self.total += other.total
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self
+
+    def image(self, reduce='count'):
+        """
+        (height, width) image with row 0 at ymin, for imshow(origin='lower').
+        Empty pixels are 0 for 'count' and NaN otherwise.
+        """
+        if reduce not in REDUCTIONS:
+            raise ValueError('reduce must be one of %s' % (REDUCTIONS,))
+        empty = self.count == 0
+        if reduce == 'count':
+            img = self.count.astype(float)
+        elif reduce == 'sum':
+            img = np.where(empty, np.nan, self.total)
+        elif reduce == 'mean':
+            img = np.where(empty, np.nan, self.total / np.maximum(self.count, 1))
+        elif reduce == 'min':
+            img = np.where(empty, np.nan, self.min)
+        else:
+            img = np.where(empty, np.nan, self.max)
+        return img.reshape(self.height, self.width)
+
+
+def rasterize(x, y, values=None, extent=None, resolution=0.05, reduce='count'):
+    """One-shot rasterization of a set of points, see RasterAccumulator."""
+    if extent is None:
+        extent = (np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y))
+    acc = RasterAccumulator(extent, resolution)
+    acc.add(x, y, values)
+    return acc.image(reduce)
+
+
+def plot_raster(ax, image, extent, track=None, cmap='viridis', log=False, colorbar=True, **kwargs):
+    """
+    Show a raster on a matplotlib axis, optionally with the track lines on top.
+    `extent` is the grid extent of the raster (RasterAccumulator.grid_extent).
+    """
+    img = np.log1p(image) if log else image
+    im = ax.imshow(img, extent=extent, origin='lower', cmap=cmap, interpolation='nearest', **kwargs)
+    if track is not None:
+        track = np.asarray(track)
+        for c in (0, 2, 4):
+            ax.plot(track[:, c], track[:, c + 1], color='#999999' if c == 0 else '#333333',
+                    linewidth=0.8, zorder=2)
+    ax.set_aspect('equal')
+    if colorbar:
+        ax.figure.colorbar(im, ax=ax)
+    return im
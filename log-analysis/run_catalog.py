@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+'''
+Catalog of model folders with cached per-iteration summaries.
+
+Every model folder found under the scanned roots (intermediate_checkpoint/<id>,
+downloaded_model/<id>, ...) gets one catalog entry with its model id, track,
+action space and sensors (model_metadata.json), training hyperparameters (from
+the downloaded logs), training date and the per-iteration summary of its
+traces (trace_aggregator), stored as a CSV next to the catalog. Folders are
+only re-summarized when their files change. Cross-run comparison then reads
+the catalog, not the raw traces:
+
+    catalog = RunCatalog('reports/catalog')
+    catalog.scan(['intermediate_checkpoint', 'downloaded_model'])
+    catalog.runs()                                   # one row per model folder
+    catalog.compare('progress_mean')                 # iteration x run table
+
+    python run_catalog.py scan intermediate_checkpoint downloaded_model --tracks ../Analysis/tracks
+    python run_catalog.py list
+'''
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from model_bundle import ModelBundle, natural_key
+
+DEFAULT_PATH = os.path.join('reports', 'catalog')
+CATALOG_FILE = 'catalog.json'
+DEFAULT_ROOTS = ('intermediate_checkpoint', 'downloaded_model')
+# Subfolders that mark a directory as a model folder.
+MODEL_MARKERS = ('sim-trace', 'metrics', 'model', 'model-artifacts')
+# Relative difference allowed when matching a trace's track_len to a track file.
+TRACK_LENGTH_TOLERANCE = 0.005
+
+_WORLD_NAME = re.compile(r"WORLD_NAME'?\s*[:=]\s*'?([A-Za-z0-9_\-]+)")
+_HYPERPARAMETERS = re.compile(r'Using the following hyper-parameters\s*(\{.*?\})', re.S)
+_DATE = re.compile(r'(?:training|evaluation)-(\d{14})-')
+
+
+def find_model_folders(roots):
+    """Directories below `roots` that contain model artifacts."""
+    found = []
+    for root in roots:
+        for dirpath, dirnames, _ in os.walk(root):
+            if any(m in dirnames for m in MODEL_MARKERS):
+                found.append(dirpath)
+                dirnames[:] = []
+    return sorted(found, key=natural_key)
+
+
+def fingerprint(root):
+    """(file count, total size, newest mtime) of a folder, to detect changes."""
+    count = size = newest = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            st = os.stat(os.path.join(dirpath, name))
+            count += 1
+            size += st.st_size
+            newest = max(newest, st.st_mtime_ns)
+    return [count, size, newest]
+
+
+def read_log_info(files):
+    """Track name and hyperparameters logged by the SageMaker/RoboMaker jobs."""
+    track, hyperparameters = None, None
+    for fname in files:
+        with open(fname, errors='replace') as f:
+            text = f.read()
+        if track is None:
+            m = _WORLD_NAME.search(text)
+            track = m.group(1) if m else None
+        if hyperparameters is None:
+            m = _HYPERPARAMETERS.search(text)
+            if m:
+                try:
+                    hyperparameters = json.loads(m.group(1))
+                except ValueError:
+                    pass
+    return track, hyperparameters
+
+
+def track_lengths(tracks_dir):
+    """Center line length of every track .npy in `tracks_dir`, by track name."""
+    lengths = {}
+    for fname in glob.glob(os.path.join(tracks_dir, '*.npy')):
+        center = np.load(fname)[:, 0:2]
+        lengths[os.path.splitext(os.path.basename(fname))[0]] = float(
+            np.hypot(*np.diff(center, axis=0).T).sum())
+    return lengths
+
+
+def match_track(track_len, lengths):
+    """Name of the track whose length matches `track_len`, or None."""
+    best = min(lengths.items(), key=lambda kv: abs(kv[1] - track_len), default=None)
+    if best and abs(best[1] - track_len) <= TRACK_LENGTH_TOLERANCE * track_len:
+        return best[0]
+    return None
+
+
+def training_date(bundle):
+    """Date of the first training (or evaluation) metrics file, else of the oldest trace."""
+    for fname in bundle.training_metrics_files + bundle.evaluation_metrics_files:
+        m = _DATE.search(os.path.basename(fname))
+        if m:
+            return datetime.strptime(m.group(1), '%Y%m%d%H%M%S').isoformat()
+    files = bundle.training_trace_files
+    if files:
+        return datetime.fromtimestamp(min(os.path.getmtime(f) for f in files)).isoformat()
+    return None
+
+
+def action_space_info(metadata):
+    if not metadata:
+        return {}
+    space = metadata.get('action_space')
+    info = {
+        'action_space_type': metadata.get('action_space_type', 'discrete' if isinstance(space, list) else None),
+        'sensor': ','.join(metadata.get('sensor') or []),
+        'neural_network': metadata.get('neural_network'),
+        'training_algorithm': metadata.get('training_algorithm'),
+    }
+    if isinstance(space, list):
+        info['actions'] = len(space)
+        info['speed_min'] = min(a['speed'] for a in space)
+        info['speed_max'] = max(a['speed'] for a in space)
+        info['steering_max'] = max(abs(a['steering_angle']) for a in space)
+    elif isinstance(space, dict):
+        info['speed_min'] = space['speed']['low']
+        info['speed_max'] = space['speed']['high']
+        info['steering_max'] = max(abs(space['steering_angle']['low']), abs(space['steering_angle']['high']))
+    return info
+
+
+def summarize_traces(files):
+    """Per-iteration summary of trace files, read chunk by chunk; also returns a track_len."""
+    from simtrace_loader import iter_simtrace_chunks
+    from trace_aggregator import TraceAggregator
+
+    agg = TraceAggregator()
+    track_len = None
+    for fname in files:
+        for chunk in iter_simtrace_chunks(fname):
+            agg.update(chunk)
+            if track_len is None and 'track_len' in chunk and len(chunk):
+                track_len = float(chunk['track_len'].iloc[0])
+    return agg.iterations(), track_len
+
+
+class RunCatalog:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.entries = {}
+        catalog_file = os.path.join(path, CATALOG_FILE)
+        if os.path.exists(catalog_file):
+            with open(catalog_file) as f:
+                self.entries = json.load(f)['runs']
+
+    def _summary_path(self, key, kind):
+        return os.path.join(self.path, 'runs', re.sub(r'[^A-Za-z0-9_.-]+', '_', key), kind + '.csv')
+
+    def add(self, root, lengths=None, force=False):
+        """Catalog one model folder; returns False if it was unchanged."""
+        key = os.path.normpath(root)
+        fp = fingerprint(root)
+        if not force and key in self.entries and self.entries[key]['fingerprint'] == fp:
+            return False
+
+        bundle = ModelBundle(root)
+        track, hyperparameters = read_log_info(bundle.log_files)
+        entry = {
+            'key': key,
+            'model_id': bundle.model_id,
+            'root': root,
+            'fingerprint': fp,
+            'date': training_date(bundle),
+            'hyperparameters': hyperparameters or {},
+            'training_iterations': len(bundle.training_trace_files),
+            'evaluation_runs': bundle.evaluation_runs,
+            'summaries': {},
+        }
+        entry.update(action_space_info(bundle.metadata))
+
+        track_len = None
+        sources = [('training', bundle.training_trace_files)]
+        sources += [('evaluation-' + run, bundle.evaluation_trace_files(run)) for run in bundle.evaluation_runs]
+        for kind, files in sources:
+            if not files:
+                continue
+            iterations, length = summarize_traces(files)
+            track_len = track_len or length
+            out = self._summary_path(key, kind)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            iterations.to_csv(out)
+            entry['summaries'][kind] = os.path.relpath(out, self.path)
+        if not bundle.training_trace_files and bundle.training_metrics_files:
+            from metrics_reader import TrainingMetricsReader
+
+            frames = []
+            for fname in bundle.training_metrics_files:
+                reader = TrainingMetricsReader(fname)
+                reader.poll()
+                frames.append(reader.iterations())
+            out = self._summary_path(key, 'training-metrics')
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            pd.concat(frames).to_csv(out)
+            entry['summaries']['training-metrics'] = os.path.relpath(out, self.path)
+
+        if track is None and track_len and lengths:
+            track = match_track(track_len, lengths)
+        entry['track'] = track
+        entry['track_len'] = track_len
+        self.entries[key] = entry
+        return True
+
+    def scan(self, roots=DEFAULT_ROOTS, tracks_dir=None, force=False):
+        """Catalog every model folder under `roots`; returns the keys that were (re)indexed."""
+        lengths = track_lengths(tracks_dir) if tracks_dir else None
+        updated = [root for root in find_model_folders(roots) if self.add(root, lengths, force)]
+        self.save()
+        return [os.path.normpath(r) for r in updated]
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        out = os.path.join(self.path, CATALOG_FILE)
+        with open(out + '.tmp', 'w') as f:
+            json.dump({'runs': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(out + '.tmp', out)
+
+    def runs(self, by_model=False, **filters):
+        """
+        One row per cataloged folder, or per model id with `by_model` (a model
+        pulled into several folders then combines what each folder knows).
+        Keyword filters match columns, e.g. track='Austin'.
+        """
+        columns = ['model_id', 'track', 'date', 'action_space_type', 'actions', 'speed_min', 'speed_max',
+                   'steering_max', 'sensor', 'training_iterations', 'evaluation_runs']
+        rows = []
+        # The same evaluation run is often pulled into several folders; a
+        # model counts each run id once.
+        model_runs = {}
+        for key, e in sorted(self.entries.items()):
+            row = {c: e.get(c) for c in columns}
+            row['evaluation_runs'] = len(e.get('evaluation_runs', []))
+            row.update({'hp_' + k: v for k, v in e.get('hyperparameters', {}).items()})
+            rows.append(pd.Series(row, name=key))
+            model_runs.setdefault(e.get('model_id'), set()).update(e.get('evaluation_runs', []))
+        df = pd.DataFrame(rows)
+        if by_model and len(df):
+            how = {c: 'first' for c in df.columns if c != 'model_id'}
+            how.update(date='min', training_iterations='max')
+            df = df.groupby('model_id').agg(how)
+            df['evaluation_runs'] = [len(model_runs[m]) for m in df.index]
+        for column, value in filters.items():
+            df = df[df[column] == value]
+        return df
+
+    def iterations(self, key, kind='training'):
+        """Cached per-iteration summary of one run (key or model id)."""
+        entries = [self.entries[key]] if key in self.entries else \
+            [e for _, e in sorted(self.entries.items()) if e['model_id'] == key]
+        if not entries:
+            raise KeyError(key)
+        for entry in entries:
+            if kind in entry['summaries']:
+                return pd.read_csv(os.path.join(self.path, entry['summaries'][kind]), index_col=0)
+        return None
+
+    def compare(self, column, keys=None, kind='training'):
+        """Iteration x run table of one summary column, e.g. 'progress_mean'."""
+        series = {}
+        for key in keys or sorted(self.entries):
+            table = self.iterations(key, kind)
+            if table is not None and column in table:
+                series[key] = table[column]
+        return pd.DataFrame(series)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Catalog model folders and their per-iteration summaries.')
+    parser.add_argument('--catalog', default=DEFAULT_PATH, help='catalog folder')
+    sub = parser.add_subparsers(dest='command', required=True)
+    scan = sub.add_parser('scan', help='index model folders')
+    scan.add_argument('roots', nargs='*', default=list(DEFAULT_ROOTS))
+    scan.add_argument('--tracks', default=None, help='track .npy folder, to name tracks by length')
+    scan.add_argument('--force', action='store_true', help='re-index unchanged folders')
+    sub.add_parser('list', help='print the catalog')
+    args = parser.parse_args(argv)
+
+    catalog = RunCatalog(args.catalog)
+    if args.command == 'scan':
+        updated = catalog.scan(args.roots, args.tracks, args.force)
+        print('%d folders indexed, %d in catalog' % (len(updated), len(catalog.entries)))
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(catalog.runs())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
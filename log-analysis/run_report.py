@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+'''
+Headless analysis of a training or evaluation run, without notebooks.
+
+Takes a model folder (see model_bundle) or a glob of simtrace CSVs and runs
+parse -> episode index -> lap metrics -> section stats -> heatmap over the
+files in a process pool. Writes a static report.md (with a heatmap image when
+matplotlib is installed) plus machine-readable summary.json and CSV tables.
+
+    python run_report.py intermediate_checkpoint/<model-id> --track ../Analysis/tracks/Austin.npy
+    python run_report.py "logs/*.csv" --out reports/logs --sections 6
+
+Section statistics and the heatmap need --track.
+'''
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model_bundle import ModelBundle, natural_key
+from rasterizer import RasterAccumulator, track_extent
+from section_stats import SectionStats, curvature_sections, waypoint_sections
+from simtrace_loader import load_simtrace
+
+LAP_COMPLETE = 'lap_complete'
+
+
+def find_trace_files(target, evaluation=False):
+    """Simtrace files for a model folder, a single file or a glob pattern."""
+    if os.path.isdir(target):
+        bundle = ModelBundle(target)
+        if evaluation:
+            return [f for run in bundle.evaluation_runs for f in bundle.evaluation_trace_files(run)]
+        return bundle.training_trace_files
+    return sorted(glob.glob(target), key=natural_key)
+
+
+def episode_index(df):
+    """
+    One row per (iteration, episode): steps, total reward, max progress, start
+    and end timestamps, final status, whether the lap was completed and the
+    lap time of completed laps.
+    """
+    g = df.groupby(['iteration', 'episode'], sort=True)
+    episodes = g.agg(steps=('steps', 'size'), reward=('reward', 'sum'), progress=('progress', 'max'),
+                     start=('timestamp', 'min'), end=('timestamp', 'max'))
+    if 'episode_status' in df:
+        episodes['status'] = g['episode_status'].last().astype(str)
+        complete = (episodes['status'] == LAP_COMPLETE) | (episodes['progress'] >= 100)
+    else:
+        complete = episodes['progress'] >= 100
+    episodes['complete'] = complete
+    episodes['lap_time'] = np.where(complete, episodes['end'] - episodes['start'], np.nan)
+    return episodes.reset_index()
+
+
+def lap_metrics(episodes):
+    """Per-iteration reward, progress, completion rate and lap times."""
+    g = episodes.groupby('iteration')
+    return pd.DataFrame({
+        'episodes': g.size(),
+        'reward_mean': g['reward'].mean(),
+        'progress_mean': g['progress'].mean(),
+        'completion_rate': g['complete'].mean(),
+        'laps': g['complete'].sum(),
+        'best_lap_time': g['lap_time'].min(),
+        'mean_lap_time': g['lap_time'].mean(),
+    })
+
+
+def _section_ids(df, track, sections):
+    if sections == 'curvature':
+        return curvature_sections(track)[df['closest_waypoint'].values % len(track)]
+    n = int(sections)
+    bounds = np.linspace(0, len(track), n + 1)[:-1].astype(int)
+    return waypoint_sections(df['closest_waypoint'].values, bounds)
+
+
+def _analyze_file(fname, track_file, sections, resolution):
+    df = load_simtrace(fname)
+    result = {'file': fname, 'episodes': episode_index(df), 'steps': len(df)}
+    if track_file:
+        track = np.load(track_file)
+        n_sections = 2 if sections == 'curvature' else int(sections)
+        stats = SectionStats(n_sections)
+        stats.update(df, _section_ids(df, track, sections))
+        raster = RasterAccumulator(track_extent(track), resolution)
+        raster.add(df['x'].values, df['y'].values)
+        speed = RasterAccumulator(track_extent(track), resolution)
+        speed.add(df['x'].values, df['y'].values, df['throttle'].values)
+        result.update(sections=stats, density=raster, speed=speed)
+    return result
+
+
+def analyze(files, track_file=None, sections='curvature', resolution=0.05, workers=None):
+    """Run the per-file pipeline in a process pool and merge the results."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_analyze_file, files, [track_file] * len(files),
+                              [sections] * len(files), [resolution] * len(files)))
+
+    episodes = pd.concat([p['episodes'] for p in parts], ignore_index=True)
+    result = {
+        'files': [p['file'] for p in parts],
+        'steps': sum(p['steps'] for p in parts),
+        'episodes': episodes,
+        'iterations': lap_metrics(episodes),
+    }
+    if track_file:
+        for key in ('sections', 'density', 'speed'):
+            merged = parts[0][key]
+            for p in parts[1:]:
+                merged.merge(p[key])
+            result[key] = merged
+    return result
+
+
+def _save_heatmaps(result, out_dir, track_file):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from rasterizer import plot_raster
+    except ImportError:
+        np.save(os.path.join(out_dir, 'density.npy'), result['density'].image('count'))
+        np.save(os.path.join(out_dir, 'speed.npy'), result['speed'].image('mean'))
+        return []
+
+    track = np.load(track_file)
+    images = []
+    for name, image, title in (('density.png', result['density'].image('count'), 'Visits (log)'),
+                               ('speed.png', result['speed'].image('mean'), 'Mean throttle')):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        plot_raster(ax, image, result['density'].grid_extent, track=track, log=name == 'density.png')
+        ax.set_title(title)
+        fig.savefig(os.path.join(out_dir, name), dpi=100, bbox_inches='tight')
+        plt.close(fig)
+        images.append(name)
+    return images
+
+
+def _json_ready(value):
+    if isinstance(value, dict):
+        return {k: _json_ready(v) for k, v in value.items()}
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def write_report(result, out_dir, title, track_file=None):
+    """Write report.md, summary.json and the CSV tables to `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    episodes, iterations = result['episodes'], result['iterations']
+    episodes.to_csv(os.path.join(out_dir, 'episodes.csv'), index=False)
+    iterations.to_csv(os.path.join(out_dir, 'iterations.csv'))
+
+    laps = episodes[episodes['complete']]
+    summary = {
+        'title': title,
+        'files': len(result['files']),
+        'steps': result['steps'],
+        'episodes': len(episodes),
+        'iterations': len(iterations),
+        'laps': len(laps),
+        'completion_rate': float(episodes['complete'].mean()) if len(episodes) else None,
+        'best_lap_time': laps['lap_time'].min() if len(laps) else None,
+        'mean_progress': episodes['progress'].mean() if len(episodes) else None,
+        'last_iteration': _json_ready(iterations.iloc[-1].to_dict()) if len(iterations) else None,
+    }
+
+    lines = ['# %s' % title, '',
+             '%d files, %d steps, %d episodes, %d iterations, %d completed laps.' % (
+                 summary['files'], summary['steps'], summary['episodes'], summary['iterations'],
+                 summary['laps']), '']
+    if summary['best_lap_time'] is not None:
+        lines += ['Best lap time: %.2f s' % summary['best_lap_time'], '']
+
+    lines += ['## Iterations', '', iterations.round(3).to_markdown() if _has_tabulate()
+              else '```\n%s\n```' % iterations.round(3).to_string(), '']
+
+    if 'sections' in result:
+        sections = result['sections'].summary()
+        sections.to_csv(os.path.join(out_dir, 'sections.csv'))
+        summary['sections'] = _json_ready(
+            sections[['steps', 'speed_mean', 'throttle_mean', 'reward_mean', 'time_mean']].to_dict('index'))
+        cols = ['steps', 'speed_mean', 'speed_p50', 'throttle_mean', 'steer_mean', 'reward_mean', 'time_mean']
+        lines += ['## Sections', '', '```\n%s\n```' % sections[cols].round(3).to_string(), '']
+        for image in _save_heatmaps(result, out_dir, track_file):
+            lines += ['![%s](%s)' % (image, image), '']
+
+    with open(os.path.join(out_dir, 'summary.json'), 'w') as f:
+        json.dump(_json_ready(summary), f, indent=2)
+    with open(os.path.join(out_dir, 'report.md'), 'w') as f:
+        f.write('\n'.join(lines))
+    return summary
+
+
+def _has_tabulate():
+    try:
+        import tabulate  # noqa: F401  (needed by DataFrame.to_markdown)
+        return True
+    except ImportError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze simtrace logs and write a static report.')
+    parser.add_argument('target', help='model folder, simtrace CSV or glob of CSVs')
+    parser.add_argument('--out', default=None, help='output directory, default reports/<name>')
+    parser.add_argument('--track', default=None, help='track .npy file for sections and heatmaps')
+    parser.add_argument('--sections', default='curvature',
+                        help="'curvature' (straight/curve) or a number of equal waypoint ranges")
+    parser.add_argument('--evaluation', action='store_true', help='use evaluation traces of a model folder')
+    parser.add_argument('--resolution', type=float, default=0.05, help='heatmap pixel size in meters')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    files = find_trace_files(args.target, args.evaluation)
+    if not files:
+        print('no simtrace files found for %s' % args.target)
+        return 1
+
+    name = os.path.basename(os.path.normpath(args.target.split('*')[0])) or 'run'
+    out_dir = args.out or os.path.join('reports', name)
+    result = analyze(files, args.track, args.sections, args.resolution, args.workers)
+    summary = write_report(result, out_dir, name, args.track)
+    print('%s: %d episodes, %d laps -> %s' % (name, summary['episodes'], summary['laps'], out_dir))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+'''
+Per-track-section statistics over whole training runs.
+
+Every trace step is assigned to a section, either by waypoint ranges (like the
+sections from deepracer.tracks.track_utils.track_breakdown) or by a
+straight/curve classification of the centerline (like get_track_section in
+reward_qualifier.py). SectionStats then keeps per-section moments and
+histograms of speed, throttle, steering and reward plus time spent in each
+section per visit, all updated with grouped numpy reductions so new
+iterations can be added as they arrive. A visit is a run of consecutive steps
+of one episode in the same section, so an episode that passes a section twice
+(every curve with curvature_sections, every lap with waypoint_sections) counts
+two visits.
+'''
+import numpy as np
+import pandas as pd
+
+STRAIGHT = 0
+CURVE = 1
+
+# Histogram edges per metric, values outside are counted in the edge bins.
+METRIC_BINS = {
+    'speed': np.linspace(0.0, 5.0, 51),
+    'throttle': np.linspace(0.0, 5.0, 51),
+    'steer': np.linspace(-35.0, 35.0, 71),
+    'reward': np.linspace(0.0, 1000.0, 101),
+}
+TIME_BINS = np.linspace(0.0, 30.0, 121)
+
+
+def waypoint_sections(closest_waypoint, boundaries):
+    """
+    Section id per step from the waypoint index each section starts at.
+
+    With boundaries [0, 30, 75] waypoints 0-29 are section 0, 30-74 section 1
+    and 75 onwards section 2. Waypoints before the first boundary belong to the
+    last section, since the loop wraps around.
+    """
+    boundaries = np.asarray(boundaries)
+    ids = np.searchsorted(boundaries, np.asarray(closest_waypoint), side='right') - 1
+    ids[ids < 0] = len(boundaries) - 1
+    return ids
+
+
+def curvature_sections(waypoints, threshold=0.4, window=2):
+    """
+    Classify every waypoint of a track as STRAIGHT or CURVE.
+
+    A waypoint is a curve if the centerline direction changes by more than
+    `threshold` radians between `window` waypoints behind and ahead of it.
+    Index the result with closest_waypoint to classify trace steps.
+    """
+    pts = np.asarray(waypoints, dtype=float)[:, 0:2]
+    n = len(pts)
+    idx = np.arange(n)
+    back = pts[idx] - pts[(idx - window) % n]
+    ahead = pts[(idx + window) % n] - pts[idx]
+    turn = np.arctan2(ahead[:, 1], ahead[:, 0]) - np.arctan2(back[:, 1], back[:, 0])
+    turn = (turn + np.pi) % (2 * np.pi) - np.pi
+    return np.where(np.abs(turn) > threshold, CURVE, STRAIGHT)
+
+
+def _column(df, *names):
+    for name in names:
+        if name in df:
+            return df[name]
+    raise KeyError('none of %s in trace columns' % (names,))
+
+
+def step_speed(df, position_scale=1.0):
+    """
+    Ground speed of each step from consecutive positions and timestamps of the
+    same episode. Positions are divided by `position_scale` (100 for frames from
+    convert_to_pandas); the first step of every episode is NaN.
+    """
+    x = _column(df, 'x', 'X').values / position_scale
+    y = _column(df, 'y', 'Y').values / position_scale
+    t = pd.to_numeric(_column(df, 'timestamp', 'tstamp')).values
+    episode = df['episode'].values
+
+    speed = np.full(len(df), np.nan)
+    if len(df) > 1:
+        same = episode[1:] == episode[:-1]
+        dt = np.diff(t)
+        valid = same & (dt > 0)
+        dist = np.hypot(np.diff(x), np.diff(y))
+        speed[1:][valid] = dist[valid] / dt[valid]
+    return speed
+
+
+class SectionStats:
+    """
+    Incrementally maintained statistics per track section.
+
+    stats = SectionStats(n_sections=3)
+    for df in iteration_frames:
+        stats.update(df, waypoint_sections(df['closest_waypoint'], [0, 30, 75]))
+    stats.summary()
+    """
+
+    def __init__(self, n_sections, metric_bins=None, time_bins=None, position_scale=1.0):
+        self.n_sections = n_sections
+        self.metric_bins = dict(metric_bins or METRIC_BINS)
+        self.time_bins = TIME_BINS if time_bins is None else np.asarray(time_bins)
+        self.position_scale = position_scale
+
+        self.steps = np.zeros(n_sections, dtype=np.int64)
+        self.count = {}
+        self.total = {}
+        self.total_sq = {}
+        self.min = {}
+        self.max = {}
+        self.hist = {}
+        for m, edges in self.metric_bins.items():
+            self.count[m] = np.zeros(n_sections, dtype=np.int64)
+            self.total[m] = np.zeros(n_sections)
+            self.total_sq[m] = np.zeros(n_sections)
+            self.min[m] = np.full(n_sections, np.inf)
+            self.max[m] = np.full(n_sections, -np.inf)
+            self.hist[m] = np.zeros((n_sections, len(edges) - 1), dtype=np.int64)
+
+        self.visits = np.zeros(n_sections, dtype=np.int64)
+        self.time_total = np.zeros(n_sections)
+        self.time_hist = np.zeros((n_sections, len(self.time_bins) - 1), dtype=np.int64)
+
+    def _metric_values(self, df):
+        values = {'speed': step_speed(df, self.position_scale)}
+        for m in self.metric_bins:
+            if m != 'speed':
+                values[m] = df[m].values.astype(float)
+        return values
+
+    def update(self, df, sections):
+        """
+        Add the steps of `df` (one or more whole episodes, in step order) with
+        their section ids.
+        """
+        sections = np.asarray(sections, dtype=np.int64)
+        n = self.n_sections
+        self.steps += np.bincount(sections, minlength=n)
+
+        for m, v in self._metric_values(df).items():
+            ok = ~np.isnan(v)
+            sec, v = sections[ok], v[ok]
+            self.count[m] += np.bincount(sec, minlength=n)
+            self.total[m] += np.bincount(sec, weights=v, minlength=n)
+            self.total_sq[m] += np.bincount(sec, weights=v * v, minlength=n)
+            np.minimum.at(self.min[m], sec, v)
+            np.maximum.at(self.max[m], sec, v)
+
+            edges = self.metric_bins[m]
+            b = np.clip(np.searchsorted(edges, v, side='right') - 1, 0, len(edges) - 2)
+            self.hist[m] += np.bincount(sec * (len(edges) - 1) + b,
+                                        minlength=n * (len(edges) - 1)).reshape(n, -1)
+
+        if len(df) == 0:
+            return self
+        # Time in section: per-step dt summed per visit, a new visit starting
+        # wherever the episode or the section changes.
+        t = pd.to_numeric(_column(df, 'timestamp', 'tstamp')).values
+        episode = df['episode'].values
+        dt = np.zeros(len(df))
+        same = episode[1:] == episode[:-1]
+        dt[1:] = np.where(same, np.diff(t), 0.0)
+        start = np.r_[True, ~same | (sections[1:] != sections[:-1])]
+        visit = np.cumsum(start) - 1
+        per_visit = np.bincount(visit, weights=dt)
+        visit_sec = sections[start]
+        self.visits += np.bincount(visit_sec, minlength=n)
+        self.time_total += np.bincount(visit_sec, weights=per_visit, minlength=n)
+        tb = np.clip(np.searchsorted(self.time_bins, per_visit, side='right') - 1,
+                     0, len(self.time_bins) - 2)
+        self.time_hist += np.bincount(visit_sec * (len(self.time_bins) - 1) + tb,
+                                      minlength=n * (len(self.time_bins) - 1)).reshape(n, -1)
+        return self
+
+    def merge(self, other):
+        """Add the statistics of another SectionStats built with the same bins."""
+        self.steps += other.steps
+        for m in self.metric_bins:
+            self.count[m] += other.count[m]
+            self.total[m] += other.total[m]
+            self.total_sq[m] += other.total_sq[m]
+            np.minimum(self.min[m], other.min[m], out=self.min[m])
+            np.maximum(self.max[m], other.max[m], out=self.max[m])
+            self.hist[m] += other.hist[m]
+        self.visits += other.visits
+        self.time_total += other.time_total
+        self.time_hist += other.time_hist
+        return self
+
+    def quantile(self, metric, q):
+        """Approximate quantile per section from the metric histogram."""
+        if metric == 'time':
+            hist, edges = self.time_hist, self.time_bins
+        else:
+            hist, edges = self.hist[metric], self.metric_bins[metric]
+        cum = np.cumsum(hist, axis=1)
+        total = cum[:, -1]
+        out = np.full(self.n_sections, np.nan)
+        for s in np.nonzero(total)[0]:
+            target = q * total[s]
+            b = np.searchsorted(cum[s], target)
+            lo = cum[s, b - 1] if b > 0 else 0
+            frac = (target - lo) / hist[s, b] if hist[s, b] else 0.0
+            out[s] = edges[b] + frac * (edges[b + 1] - edges[b])
+        if metric != 'time':
+            out = np.clip(out, self.min[metric], self.max[metric])
+        return out
+
+    def summary(self, quantiles=(0.1, 0.5, 0.9)):
+        """DataFrame with one row per section."""
+        data = {'steps': self.steps}
+        for m in self.metric_bins:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = self.total[m] / self.count[m]
+                var = self.total_sq[m] / self.count[m] - mean ** 2
+            data['%s_mean' % m] = mean
+            data['%s_std' % m] = np.sqrt(np.maximum(var, 0))
+            data['%s_min' % m] = np.where(self.count[m] > 0, self.min[m], np.nan)
+            data['%s_max' % m] = np.where(self.count[m] > 0, self.max[m], np.nan)
+            for q in quantiles:
+                data['%s_p%d' % (m, round(q * 100))] = self.quantile(m, q)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data['time_mean'] = self.time_total / self.visits
+        for q in quantiles:
+            data['time_p%d' % round(q * 100)] = self.quantile('time', q)
+        data['visits'] = self.visits
+        df = pd.DataFrame(data)
+        df.index.name = 'section'
+        return df
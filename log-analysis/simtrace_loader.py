@@ -0,0 +1,152 @@
+'''
+Fast loader for simtrace CSV files.
+
+Handles both simtrace schemas seen in our logs:
+
+    ...,action,...,tstamp,episode_status,pause_duration,obstacle_crash_counter
+    0,1.0,...,[30.0 3.5197862070592993],...        (sim-trace/*/N-iteration.csv)
+    0,1.0,...,"[30.0, 0.5608882080663238]",...     (logs/deepracer-*.csv, no crash counter)
+
+and discrete models, which log the action index as a plain integer. The whole
+file is parsed by the pandas C reader; the action column is split into
+'action_steer'/'action_speed' by joining it into one string and converting all
+numbers at once, without per-row eval or regex.
+
+Column names follow log_analysis.convert_to_pandas (x, y, on_track, timestamp,
+...), but positions stay in meters as logged.
+
+Iterations count from 0, as in the N-iteration.csv file names: when a trace has
+no iteration of its own, episodes 0 to episodes_per_iteration - 1 are iteration
+0. trace_merge and metrics_reader use the same numbering; the notebook helper
+log_analysis.convert_to_pandas keeps its own numbering from 1.
+'''
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+EPISODE_PER_ITER = 20
+
+RENAME = {
+    'X': 'x',
+    'Y': 'y',
+    'all_wheels_on_track': 'on_track',
+    'tstamp': 'timestamp',
+}
+
+DTYPES = {
+    'episode': np.int64,
+    'steps': np.float64,
+    'X': np.float64,
+    'Y': np.float64,
+    'yaw': np.float64,
+    'steer': np.float64,
+    'throttle': np.float64,
+    'action': str,
+    'reward': np.float64,
+    'done': bool,
+    'all_wheels_on_track': bool,
+    'progress': np.float64,
+    'closest_waypoint': np.int64,
+    'track_len': np.float64,
+    'tstamp': np.float64,
+    'episode_status': 'category',
+    'pause_duration': np.float64,
+    'obstacle_crash_counter': np.int64,
+    'iteration': np.int64,
+    'worker': np.int64,
+    'worker_episode': np.int64,
+}
+
+_ACTION_CHARS = str.maketrans('[],"', '    ')
+
+
+def parse_action_column(values):
+    """
+    Parse a column of action strings.
+
+    Returns (index, steer, speed): for discrete traces `index` holds the action
+    indices and steer/speed are None; for continuous traces `index` is None and
+    steer/speed are float arrays.
+    """
+    values = np.asarray(values, dtype=object)
+    n = len(values)
+    if n == 0:
+        return None, np.empty(0), np.empty(0)
+    numbers = np.fromstring(' '.join(values).translate(_ACTION_CHARS), sep=' ')
+    if len(numbers) == n:
+        return numbers.astype(np.int64), None, None
+    if len(numbers) == 2 * n:
+        pairs = numbers.reshape(n, 2)
+        return None, pairs[:, 0].copy(), pairs[:, 1].copy()
+    raise ValueError('unrecognized action column: %d values for %d rows' % (len(numbers), n))
+
+
+def iteration_from_name(fname):
+    m = re.match(r'(\d+)-iteration', os.path.basename(str(fname)))
+    return int(m.group(1)) if m else None
+
+
+def normalize_simtrace(df, iteration=None, episodes_per_iteration=EPISODE_PER_ITER):
+    """
+    Turn a raw simtrace frame into the loader schema: renamed columns, integer
+    steps, split action columns and an iteration column. When `iteration` is
+    None the trace's own iteration column is kept (merged traces, see
+    trace_merge) or it is derived from the episode number, counting from 0.
+    """
+    df = df.rename(columns=RENAME)
+    df['steps'] = df['steps'].astype(np.int64)
+
+    if 'action' in df:
+        index, steer, speed = parse_action_column(df['action'].values)
+        if index is not None:
+            df['action'] = index
+        else:
+            df['action'] = np.nan
+            df['action_steer'] = steer
+            df['action_speed'] = speed
+
+    if iteration is None and 'iteration' in df:
+        it = df.pop('iteration').values
+    elif iteration is None:
+        it = df['episode'].values // episodes_per_iteration
+    else:
+        it = np.full(len(df), iteration, dtype=np.int64)
+        df = df.drop(columns=['iteration'], errors='ignore')
+    df.insert(0, 'iteration', it)
+    return df
+
+
+def _dtypes_for(columns):
+    return {c: DTYPES[c] for c in columns if c in DTYPES}
+
+
+def load_simtrace(fname, iteration=None, episodes_per_iteration=EPISODE_PER_ITER):
+    """
+    Load one simtrace CSV. For N-iteration.csv files the iteration is taken from
+    the file name unless given explicitly.
+    """
+    header = pd.read_csv(fname, nrows=0).columns
+    df = pd.read_csv(fname, dtype=_dtypes_for(header), engine='c')
+    if iteration is None:
+        iteration = iteration_from_name(fname)
+    return normalize_simtrace(df, iteration, episodes_per_iteration)
+
+
+def iter_simtrace_chunks(fname, chunksize=100000, iteration=None,
+                         episodes_per_iteration=EPISODE_PER_ITER):
+    """
+    Yield a simtrace file as normalized DataFrames of at most `chunksize` rows,
+    for traces too large to load at once. Episodes may span chunk boundaries.
+    """
+    header = pd.read_csv(fname, nrows=0).columns
+    if iteration is None:
+        iteration = iteration_from_name(fname)
+    for chunk in pd.read_csv(fname, dtype=_dtypes_for(header), engine='c', chunksize=chunksize):
+        yield normalize_simtrace(chunk, iteration, episodes_per_iteration)
+
+
+def load_simtraces(files, episodes_per_iteration=EPISODE_PER_ITER):
+    frames = [load_simtrace(f, episodes_per_iteration=episodes_per_iteration) for f in files]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
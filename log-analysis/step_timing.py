@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+'''
+Simulation step timing from simtrace timestamps.
+
+The simulator is meant to step at a fixed rate (15 Hz by default). Overloaded
+RoboMaker workers step slower, which stretches lap times and changes what the
+policy sees between actions. step_times() adds per-step dt, instantaneous rate,
+pause and slow-step flags to a trace; timing_summary() reduces those per
+worker, iteration or episode (mean/median/p95 dt, rate, jitter, slow steps,
+pause gaps and the largest gap).
+
+Steps with episode_status 'pause' (after an off-track reset in evaluation) are
+counted as pause time, not as slow steps. A 'worker' column is used when the
+trace has one (merged multi-worker traces), otherwise all rows are worker 0.
+
+    python step_timing.py "sim-trace/training/training-simtrace/*.csv" --by iteration
+'''
+import argparse
+import glob
+import sys
+
+import numpy as np
+import pandas as pd
+
+NOMINAL_RATE = 15.0
+# A step is slow when its instantaneous rate is below this fraction of nominal.
+SLOW_FRACTION = 0.75
+PAUSE_STATUS = 'pause'
+LEVELS = ('worker', 'iteration', 'episode')
+
+
+def step_times(df, nominal_rate=NOMINAL_RATE, slow_rate=None):
+    """
+    Copy of the trace ordered by worker, iteration, episode and step, with
+    columns dt (seconds since the previous step of the same episode, NaN for
+    the first step), rate (1/dt), paused and slow.
+    """
+    if slow_rate is None:
+        slow_rate = nominal_rate * SLOW_FRACTION
+    df = df.copy()
+    if 'worker' not in df:
+        df['worker'] = 0
+    df = df.sort_values(list(LEVELS) + ['steps'], kind='stable').reset_index(drop=True)
+
+    t = df['timestamp'].values
+    dt = np.empty(len(df))
+    dt[0:1] = np.nan
+    dt[1:] = t[1:] - t[:-1]
+    keys = df[list(LEVELS)].values
+    first = np.ones(len(df), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+    dt[first] = np.nan
+
+    with np.errstate(divide='ignore'):
+        rate = 1.0 / dt
+    paused = np.zeros(len(df), dtype=bool)
+    if 'episode_status' in df:
+        paused = (df['episode_status'].astype(str) == PAUSE_STATUS).values
+    df['dt'] = dt
+    df['rate'] = rate
+    df['paused'] = paused
+    df['slow'] = ~paused & (dt > 1.0 / slow_rate)
+    return df
+
+
+def timing_summary(timed, by='iteration', nominal_rate=NOMINAL_RATE):
+    """
+    Per-group timing table for a frame from step_times(). `by` is one of
+    'worker', 'iteration', 'episode' or a list of those; 'episode' groups by
+    (worker, iteration, episode).
+    """
+    if by == 'episode':
+        by = list(LEVELS)
+    active = timed[~timed['paused'] & timed['dt'].notna()]
+    g = active.groupby(by)
+    out = g['dt'].agg(active_steps='size', dt_mean='mean', dt_median='median', jitter='std')
+    out['dt_p95'] = g['dt'].quantile(0.95)
+    out['rate'] = 1.0 / out['dt_mean']
+    out['rate_ratio'] = out['rate'] / nominal_rate
+    out['slow_steps'] = g['slow'].sum()
+    out['slow_fraction'] = out['slow_steps'] / out['active_steps']
+
+    all_g = timed.groupby(by)
+    out = out.reindex(all_g.size().index)
+    out.insert(0, 'steps', all_g.size())
+    out['max_gap'] = all_g['dt'].max()
+    out['pause_steps'] = all_g['paused'].sum()
+    out['pause_time'] = timed['dt'].where(timed['paused'], 0).groupby([timed[c] for c in np.atleast_1d(by)]).sum()
+    if 'pause_duration' in timed:
+        out['pause_duration_max'] = all_g['pause_duration'].max()
+    return out
+
+
+def slow_steps(timed):
+    """Rows of a step_times() frame where the simulator fell below the slow rate."""
+    return timed[timed['slow']]
+
+
+def main(argv=None):
+    from simtrace_loader import load_simtraces
+    from model_bundle import natural_key
+
+    parser = argparse.ArgumentParser(description='Simulation step timing from simtrace timestamps.')
+    parser.add_argument('pattern', help='simtrace CSV or glob of CSVs')
+    parser.add_argument('--by', default='iteration', choices=LEVELS)
+    parser.add_argument('--rate', type=float, default=NOMINAL_RATE, help='nominal step rate in Hz')
+    parser.add_argument('--out', default=None, help='write the summary to this CSV')
+    args = parser.parse_args(argv)
+
+    files = sorted(glob.glob(args.pattern), key=natural_key)
+    if not files:
+        print('no simtrace files match %s' % args.pattern)
+        return 1
+    timed = step_times(load_simtraces(files), args.rate)
+    summary = timing_summary(timed, args.by, args.rate)
+    if args.out:
+        summary.to_csv(args.out)
+    with pd.option_context('display.max_rows', 200, 'display.max_columns', None, 'display.width', 200):
+        print(summary.round(3))
+    print('%d of %d steps below %.1f Hz' % (timed['slow'].sum(), len(timed), args.rate * SLOW_FRACTION))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
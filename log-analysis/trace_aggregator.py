@@ -0,0 +1,124 @@
+'''
+Out-of-core per-episode and per-iteration aggregation of simtraces.
+
+TraceAggregator consumes trace chunks (see simtrace_loader.iter_simtrace_chunks)
+and keeps one partial aggregate per (iteration, episode): step count, reward
+sum, max progress, first/last timestamp, lap completion and the count, mean
+and sum of squared deviations of speed (the throttle column). Partials are
+mergeable, so episodes split across chunks, files or worker processes combine
+exactly, and the final tables match a groupby over the whole trace held in
+memory while only one chunk is ever loaded.
+
+    agg = TraceAggregator()
+    for fname in files:
+        for chunk in iter_simtrace_chunks(fname):
+            agg.update(chunk)
+    agg.episodes(), agg.iterations()
+'''
+import numpy as np
+import pandas as pd
+
+KEYS = ['iteration', 'episode']
+LAP_COMPLETE = 'lap_complete'
+
+
+def _partials(df):
+    """Partial aggregates of one chunk, indexed by (iteration, episode)."""
+    complete = df['progress'] >= 100
+    if 'episode_status' in df:
+        complete |= (df['episode_status'].astype(str) == LAP_COMPLETE)
+    work = pd.DataFrame({
+        'iteration': df['iteration'].values,
+        'episode': df['episode'].values,
+        'reward': df['reward'].values,
+        'progress': df['progress'].values,
+        'timestamp': df['timestamp'].values,
+        'complete': complete.values,
+        'speed': df['throttle'].values,
+    })
+    g = work.groupby(KEYS, sort=False)
+    part = g.agg(steps=('reward', 'size'), reward_sum=('reward', 'sum'),
+                 progress_max=('progress', 'max'), t_first=('timestamp', 'min'),
+                 t_last=('timestamp', 'max'), complete=('complete', 'any'),
+                 speed_n=('speed', 'count'), speed_mean=('speed', 'mean'))
+    dev = work['speed'].values - part['speed_mean'].reindex(
+        pd.MultiIndex.from_frame(work[KEYS])).values
+    work['dev_sq'] = dev * dev
+    part['speed_m2'] = work.groupby(KEYS, sort=False)['dev_sq'].sum()
+    return part
+
+
+def _combine(parts):
+    """
+    Merge partial aggregates that may share keys. Speed moments are combined
+    with the parallel variance formula (Chan et al.).
+    """
+    both = pd.concat(parts)
+    if not both.index.has_duplicates:
+        return both
+    g = both.groupby(level=KEYS, sort=False)
+    out = g.agg(steps=('steps', 'sum'), reward_sum=('reward_sum', 'sum'),
+                progress_max=('progress_max', 'max'), t_first=('t_first', 'min'),
+                t_last=('t_last', 'max'), complete=('complete', 'any'),
+                speed_n=('speed_n', 'sum'))
+    weighted = (both['speed_n'] * both['speed_mean']).groupby(level=KEYS, sort=False).sum()
+    out['speed_mean'] = weighted / out['speed_n'].where(out['speed_n'] > 0)
+    mean_all = out['speed_mean'].reindex(both.index).values
+    spread = both['speed_m2'] + both['speed_n'] * (both['speed_mean'] - mean_all) ** 2
+    out['speed_m2'] = spread.groupby(level=KEYS, sort=False).sum()
+    return out
+
+
+class TraceAggregator:
+
+    def __init__(self):
+        self.state = None
+        self.rows = 0
+
+    def update(self, chunk):
+        """Fold one trace chunk (simtrace_loader schema) into the aggregates."""
+        if len(chunk) == 0:
+            return self
+        part = _partials(chunk)
+        self.state = part if self.state is None else _combine([self.state, part])
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Merge another aggregator, e.g. from a worker process."""
+        if other.state is not None:
+            self.state = other.state if self.state is None else _combine([self.state, other.state])
+        self.rows += other.rows
+        return self
+
+    def episodes(self):
+        """Per-episode summary, sorted by iteration and episode."""
+        if self.state is None:
+            return pd.DataFrame()
+        df = self.state.sort_index().copy()
+        df['speed_std'] = np.sqrt(df['speed_m2'] / (df['speed_n'] - 1).where(df['speed_n'] > 1))
+        df['duration'] = df['t_last'] - df['t_first']
+        df['lap_time'] = df['duration'].where(df['complete'])
+        return df.drop(columns=['speed_m2'])
+
+    def iterations(self):
+        """Per-iteration summary derived exactly from the episode partials."""
+        if self.state is None:
+            return pd.DataFrame()
+        ep = self.state
+        g = ep.groupby(level='iteration')
+        out = g.agg(episodes=('steps', 'size'), steps=('steps', 'sum'),
+                    reward_sum=('reward_sum', 'sum'), progress_mean=('progress_max', 'mean'),
+                    progress_max=('progress_max', 'max'), laps=('complete', 'sum'),
+                    speed_n=('speed_n', 'sum'))
+        out['reward_mean'] = out['reward_sum'] / out['episodes']
+        out['completion_rate'] = out['laps'] / out['episodes']
+        weighted = (ep['speed_n'] * ep['speed_mean']).groupby(level='iteration').sum()
+        out['speed_mean'] = weighted / out['speed_n'].where(out['speed_n'] > 0)
+        mean_it = out['speed_mean'].reindex(ep.index.get_level_values('iteration')).values
+        spread = ep['speed_m2'] + ep['speed_n'] * (ep['speed_mean'] - mean_it) ** 2
+        m2 = spread.groupby(level='iteration').sum()
+        out['speed_std'] = np.sqrt(m2 / (out['speed_n'] - 1).where(out['speed_n'] > 1))
+        lap_time = (ep['t_last'] - ep['t_first']).where(ep['complete'])
+        out['best_lap_time'] = lap_time.groupby(level='iteration').min()
+        return out
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+'''
+Compressed binary archive for simtraces.
+
+Traces are stored as one block per (iteration, episode), so any episode can be
+read without touching the rest of the file. Inside a block every column is
+encoded on its own:
+
+    float columns with a declared precision are quantized to integers,
+    positions, timestamps and step numbers are delta-encoded,
+    integers are stored in the smallest dtype that holds them,
+    episode_status is stored as category codes,
+
+and the block is zlib-compressed. A JSON index at the end of the file lists
+the blocks and the column layout; the last 16 bytes hold its offset.
+
+Archives hold frames in the simtrace_loader schema and read back as the same
+frames, up to the declared precision:
+
+    with TraceArchiveWriter('run.trace') as archive:
+        for chunk in iter_simtrace_chunks(fname):
+            archive.write(chunk)
+    archive = TraceArchive('run.trace')
+    archive.read_episode(iteration=3, episode=41)
+    archive.read(iterations=range(10, 20))
+
+    python trace_archive.py run.trace "sim-trace/training/training-simtrace/*.csv"
+'''
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'DRTRACE1'
+FOOTER = struct.Struct('<Q8s')
+VERSION = 1
+COMPRESSION_LEVEL = 6
+
+# Quantization step per float column. Columns not listed here, or listed with
+# None, are stored as raw float64.
+PRECISION = {
+    'x': 1e-4,
+    'y': 1e-4,
+    'yaw': 1e-4,
+    'steer': 1e-4,
+    'throttle': 1e-4,
+    'action_steer': 1e-4,
+    'action_speed': 1e-4,
+    'reward': 1e-4,
+    'progress': 1e-4,
+    'track_len': 1e-4,
+    'timestamp': 1e-3,
+    'pause_duration': 1e-3,
+}
+
+DELTA_COLUMNS = ('x', 'y', 'timestamp', 'steps', 'progress')
+KEYS = ['iteration', 'episode']
+_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _smallest_int(values):
+    if len(values) == 0:
+        return values.astype(np.int8)
+    lo, hi = values.min(), values.max()
+    for t in _INT_TYPES:
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(t)
+    return values
+
+
+def _delta(values):
+    out = values.copy()
+    out[1:] = values[1:] - values[:-1]
+    return out
+
+
+class TraceArchiveWriter:
+    """Append trace frames to an archive; close() writes the block index."""
+
+    def __init__(self, path, precision=None):
+        self.path = path
+        self.precision = dict(PRECISION if precision is None else precision)
+        self.columns = None
+        self.categories = {}
+        self.blocks = []
+        self._tmp = path + '.tmp'
+        self._f = open(self._tmp, 'wb')
+        self._f.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self._tmp)
+
+    def _layout(self, df):
+        columns = []
+        for name in df.columns:
+            dtype = df[name].dtype
+            if isinstance(dtype, pd.CategoricalDtype) or dtype == object:
+                kind = 'category'
+                self.categories[name] = []
+            elif dtype == bool:
+                kind = 'bool'
+            elif np.issubdtype(dtype, np.integer):
+                kind = 'int'
+            elif self.precision.get(name):
+                kind = 'quantized'
+            else:
+                kind = 'float'
+            columns.append({'name': name, 'kind': kind, 'dtype': str(dtype),
+                            'precision': self.precision.get(name) if kind == 'quantized' else None,
+                            'delta': name in DELTA_COLUMNS})
+        return columns
+
+    def _add_categories(self, df):
+        """
+        Extend the category lists with the categories of categorical columns,
+        in the source's order, so a read gives back the same categories.
+        Labels of object columns are added in first-seen order by _encode.
+        """
+        for column in self.columns:
+            if column['kind'] == 'category' and isinstance(df[column['name']].dtype, pd.CategoricalDtype):
+                categories = self.categories[column['name']]
+                categories.extend(label for label in df[column['name']].cat.categories.astype(str)
+                                  if label not in categories)
+
+    def _encode(self, column, values):
+        """Encoded array and its encoding: 'plain', 'delta' or 'raw' (float64)."""
+        kind = column['kind']
+        if kind == 'category':
+            categories = self.categories[column['name']]
+            labels = pd.Series(values).astype(str).values
+            categories.extend(label for label in pd.unique(labels) if label not in categories)
+            codes = pd.Categorical(labels, categories=categories).codes.astype(np.int64)
+            return _smallest_int(codes), 'plain'
+        if kind == 'bool':
+            return values.astype(np.uint8), 'plain'
+        if kind == 'quantized':
+            values = values.astype(np.float64)
+            if np.isnan(values).any():
+                return values, 'raw'
+            values = np.round(values / column['precision']).astype(np.int64)
+        elif kind == 'int':
+            values = values.astype(np.int64)
+        else:
+            return values.astype(np.float64), 'raw'
+        if column['delta']:
+            return _smallest_int(_delta(values)), 'delta'
+        return _smallest_int(values), 'plain'
+
+    def write(self, df):
+        """Append a frame; it is split into one block per (iteration, episode)."""
+        if len(df) == 0:
+            return self
+        if self.columns is None:
+            self.columns = self._layout(df)
+        elif list(df.columns) != [c['name'] for c in self.columns]:
+            raise ValueError('columns differ from the first frame written')
+        self._add_categories(df)
+
+        groups = df.groupby(KEYS, sort=False).indices
+        for (iteration, episode), rows in groups.items():
+            parts, dtypes, encodings = [], [], []
+            for column in self.columns:
+                encoded, encoding = self._encode(column, df[column['name']].values[rows])
+                parts.append(np.ascontiguousarray(encoded).tobytes())
+                dtypes.append(encoded.dtype.str)
+                encodings.append(encoding)
+            payload = zlib.compress(b''.join(parts), COMPRESSION_LEVEL)
+            self.blocks.append({'iteration': int(iteration), 'episode': int(episode),
+                                'offset': self._f.tell(), 'length': len(payload),
+                                'rows': len(rows), 'dtypes': dtypes, 'encodings': encodings})
+            self._f.write(payload)
+        return self
+
+    def close(self):
+        if self._f.closed:
+            return
+        index = {'version': VERSION, 'columns': self.columns or [],
+                 'categories': self.categories, 'blocks': self.blocks}
+        offset = self._f.tell()
+        self._f.write(zlib.compress(json.dumps(index).encode(), COMPRESSION_LEVEL))
+        self._f.write(FOOTER.pack(offset, MAGIC))
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+
+class TraceArchive:
+    """Random-access reader for archives written by TraceArchiveWriter."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('%s is not a trace archive' % path)
+            f.seek(-FOOTER.size, os.SEEK_END)
+            end = f.tell()
+            offset, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError('%s: truncated trace archive' % path)
+            f.seek(offset)
+            index = json.loads(zlib.decompress(f.read(end - offset)))
+        if index['version'] != VERSION:
+            raise ValueError('%s: unsupported archive version %s' % (path, index['version']))
+        self.columns = index['columns']
+        self.categories = index['categories']
+        self.blocks = index['blocks']
+
+    def episodes(self):
+        """Block index as a DataFrame: iteration, episode, rows, offset, length."""
+        return pd.DataFrame(self.blocks, columns=['iteration', 'episode', 'rows', 'offset', 'length'])
+
+    def _decode_block(self, f, block):
+        """Column arrays of one block; category columns stay as codes."""
+        f.seek(block['offset'])
+        raw = zlib.decompress(f.read(block['length']))
+        n = block['rows']
+        data = []
+        pos = 0
+        for column, dtype, encoding in zip(self.columns, block['dtypes'], block['encodings']):
+            dtype = np.dtype(dtype)
+            values = np.frombuffer(raw, dtype=dtype, count=n, offset=pos)
+            pos += n * dtype.itemsize
+            kind = column['kind']
+            if encoding == 'raw':
+                pass
+            elif kind == 'category':
+                values = values.astype(np.int64)
+            elif kind == 'bool':
+                values = values.astype(bool)
+            else:
+                values = values.astype(np.int64)
+                if encoding == 'delta':
+                    values = np.cumsum(values)
+                if kind == 'quantized':
+                    values = values * column['precision']
+                else:
+                    values = values.astype(column['dtype'])
+            data.append(values)
+        return data
+
+    def _read_blocks(self, blocks):
+        with open(self.path, 'rb') as f:
+            parts = [self._decode_block(f, b) for b in sorted(blocks, key=lambda b: b['offset'])]
+        if not parts:
+            return pd.DataFrame(columns=[c['name'] for c in self.columns])
+        data = {}
+        for i, column in enumerate(self.columns):
+            values = np.concatenate([p[i] for p in parts])
+            if column['kind'] == 'category':
+                values = pd.Categorical.from_codes(values, self.categories[column['name']])
+            data[column['name']] = values
+        return pd.DataFrame(data)
+
+    def read_episode(self, iteration, episode):
+        blocks = [b for b in self.blocks if b['iteration'] == iteration and b['episode'] == episode]
+        if not blocks:
+            raise KeyError((iteration, episode))
+        return self._read_blocks(blocks)
+
+    def read(self, iterations=None, episodes=None):
+        """Episodes of the given iterations and/or episode numbers (all by default)."""
+        iterations = None if iterations is None else set(iterations)
+        episodes = None if episodes is None else set(episodes)
+        return self._read_blocks([b for b in self.blocks
+                                  if (iterations is None or b['iteration'] in iterations)
+                                  and (episodes is None or b['episode'] in episodes)])
+
+
+def archive_files(files, path, chunksize=100000, precision=None):
+    """Archive simtrace CSV files; returns (csv bytes, archive bytes)."""
+    from simtrace_loader import iter_simtrace_chunks
+
+    with TraceArchiveWriter(path, precision) as archive:
+        for fname in files:
+            for chunk in iter_simtrace_chunks(fname, chunksize):
+                archive.write(chunk)
+    return sum(os.path.getsize(f) for f in files), os.path.getsize(path)
+
+
+def main(argv=None):
+    from model_bundle import natural_key
+
+    parser = argparse.ArgumentParser(description='Pack simtrace CSVs into a compressed trace archive.')
+    parser.add_argument('out', help='archive file to write')
+    parser.add_argument('pattern', help='simtrace CSV or glob of CSVs')
+    args = parser.parse_args(argv)
+
+    files = sorted(glob.glob(args.pattern), key=natural_key)
+    if not files:
+        print('no simtrace files match %s' % args.pattern)
+        return 1
+    before, after = archive_files(files, args.out)
+    print('%d files, %.1f kB -> %.1f kB (%.1fx)' % (len(files), before / 1e3, after / 1e3, before / after))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+'''
+Streaming merge of multi-worker simtrace files.
+
+With several RoboMaker workers every worker numbers its episodes from 0, so
+concatenated traces repeat episode numbers and `episode / EPISODE_PER_ITER`
+puts episodes in the wrong iteration. merge_traces() reads one row at a time
+from every worker's CSV files, merges them on timestamp with a heap
+(heapq.merge) and writes a single trace where:
+
+    episode         is renumbered globally, in order of episode start,
+    iteration       is episode // episodes_per_iteration, counting from 0 like
+                    the N-iteration.csv files (see simtrace_loader),
+    worker          is the index of the input the row came from,
+    worker_episode  is the episode number as logged by the worker.
+
+Only one pending row per worker is held in memory. Each worker's files must be
+in time order, e.g. its N-iteration.csv files sorted by N.
+
+    python trace_merge.py merged.csv "worker-0/*.csv" "worker-1/*.csv"
+'''
+import argparse
+import csv
+import glob
+import heapq
+import sys
+
+EPISODE_PER_ITER = 20
+TIME_COLUMN = 'tstamp'
+EXTRA_COLUMNS = ['iteration', 'worker', 'worker_episode']
+
+
+def _header(fname):
+    with open(fname, newline='') as f:
+        return next(csv.reader(f))
+
+
+def _worker_rows(files, worker, time_index):
+    """(timestamp, worker, row) for every row of a worker's files, in file order."""
+    last = float('-inf')
+    for fname in files:
+        with open(fname, newline='') as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                if not row:
+                    continue
+                t = float(row[time_index])
+                if t < last:
+                    raise ValueError('%s: timestamps go backwards at %s (%s < %s)' % (fname, row[0], t, last))
+                last = t
+                yield t, worker, row
+
+
+def merge_rows(workers, episodes_per_iteration=EPISODE_PER_ITER):
+    """
+    Merge the rows of several workers, each a list of CSV files. Returns the
+    output header and a generator over merged rows.
+    """
+    workers = [list(files) for files in workers if files]
+    if not workers:
+        raise ValueError('no input files')
+    header = _header(workers[0][0])
+    for files in workers:
+        for fname in files:
+            if _header(fname) != header:
+                raise ValueError('%s: columns differ from %s' % (fname, workers[0][0]))
+    time_index = header.index(TIME_COLUMN)
+    episode_index = header.index('episode')
+
+    def rows():
+        episode_ids = {}
+        streams = [_worker_rows(files, w, time_index) for w, files in enumerate(workers)]
+        for _, worker, row in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+            local = row[episode_index]
+            key = (worker, local)
+            if key not in episode_ids:
+                episode_ids[key] = len(episode_ids)
+            episode = episode_ids[key]
+            row[episode_index] = str(episode)
+            yield row + [str(episode // episodes_per_iteration), str(worker), local]
+
+    return header + EXTRA_COLUMNS, rows()
+
+
+def merge_traces(workers, out_path, episodes_per_iteration=EPISODE_PER_ITER):
+    """Write the merged trace of `workers` (lists of files) to `out_path`; returns the row count."""
+    header, rows = merge_rows(workers, episodes_per_iteration)
+    n = 0
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            n += 1
+    return n
+
+
+def main(argv=None):
+    from model_bundle import natural_key
+
+    parser = argparse.ArgumentParser(description='Merge per-worker simtrace CSVs by timestamp.')
+    parser.add_argument('out', help='merged CSV to write')
+    parser.add_argument('workers', nargs='+', help='one CSV or glob per worker')
+    parser.add_argument('--episodes-per-iteration', type=int, default=EPISODE_PER_ITER)
+    args = parser.parse_args(argv)
+
+    workers = [sorted(glob.glob(pattern), key=natural_key) for pattern in args.workers]
+    for pattern, files in zip(args.workers, workers):
+        if not files:
+            print('no files match %s' % pattern)
+            return 1
+    n = merge_traces(workers, args.out, args.episodes_per_iteration)
+    print('merged %d rows from %d workers into %s' % (n, len(workers), args.out))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+'''
+Indexed queries over trace data.
+
+Notebook cells filter the whole trace with a boolean mask for every plot
+(df[df['iteration'] == i], df[df['action'] == a], ...). TraceQuery sorts the
+trace once by (iteration, episode, steps) and builds indexes over it:
+
+    iteration, episode    contiguous row ranges in the sorted order,
+    action, waypoint      CSR buckets (sorted row numbers per value),
+    x/y                   CSR buckets over a uniform grid of `cell` meters.
+
+A query combines any of these filters by intersecting their row sets,
+starting from the smallest. When the result is a contiguous range of the
+sorted trace it is returned as an iloc slice, which pandas does not copy;
+otherwise rows are gathered with take.
+
+    q = TraceQuery(df)
+    q.select(iterations=range(10, 20), region=(0, 2, -1, 1), actions=[3, 4])
+    q.select(episodes=[41]).x
+    q.rows(waypoints=range(30, 45))     # sorted row numbers only
+
+For continuous traces pass `actions=ActionSpace.trace_actions(df)` to the
+constructor to index the nearest discrete action of every step.
+'''
+import numpy as np
+import pandas as pd
+
+ORDER = ['iteration', 'episode', 'steps']
+
+
+class _Buckets:
+    """CSR index: sorted distinct keys and the sorted row numbers of each key."""
+
+    def __init__(self, keys):
+        keys = np.asarray(keys)
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        self.keys = sorted_keys[starts]
+        self.starts = np.r_[starts, len(keys)]
+
+    def rows(self, keys):
+        """Sorted row numbers of all rows whose key is in `keys`."""
+        keys = np.unique(np.asarray(list(keys) if not np.isscalar(keys) else [keys]))
+        pos = np.searchsorted(self.keys, keys)
+        pos = pos[(pos < len(self.keys)) & (self.keys[np.minimum(pos, len(self.keys) - 1)] == keys)]
+        if len(pos) == 0:
+            return np.empty(0, dtype=np.int64)
+        if len(pos) == 1:
+            return self.order[self.starts[pos[0]]:self.starts[pos[0] + 1]]
+        return np.sort(np.concatenate([self.order[self.starts[p]:self.starts[p + 1]] for p in pos]))
+
+    def counts(self):
+        return pd.Series(np.diff(self.starts), index=self.keys)
+
+
+class _Ranges:
+    """Index over a column that is already sorted: key -> contiguous row range."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def span(self, lo, hi):
+        """Row range (start, stop) of lo <= value <= hi."""
+        return (int(np.searchsorted(self.values, lo, 'left')),
+                int(np.searchsorted(self.values, hi, 'right')))
+
+    def select(self, keys):
+        """A (start, stop) range for a scalar or step-1 range, else sorted rows."""
+        if np.isscalar(keys):
+            return self.span(keys, keys)
+        if isinstance(keys, range) and keys.step == 1:
+            return self.span(keys.start, keys.stop - 1) if len(keys) else (0, 0)
+        spans = [self.span(k, k) for k in np.unique(np.asarray(list(keys)))]
+        return np.concatenate([np.arange(a, b) for a, b in spans]) if spans else np.empty(0, dtype=np.int64)
+
+
+def _size(selection):
+    return selection[1] - selection[0] if isinstance(selection, tuple) else len(selection)
+
+
+def _intersect(a, b):
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return (max(a[0], b[0]), max(max(a[0], b[0]), min(a[1], b[1])))
+    if isinstance(a, tuple):
+        a, b = b, a
+    if isinstance(b, tuple):
+        lo, hi = np.searchsorted(a, b)
+        return a[lo:hi]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+class TraceQuery:
+
+    def __init__(self, df, cell=0.5, actions=None):
+        order = np.lexsort(tuple(df[c].values for c in reversed(ORDER)))
+        self.df = df.iloc[order].reset_index(drop=True)
+        self.cell = float(cell)
+
+        self._iteration = _Ranges(self.df['iteration'].values)
+        # Episode numbers are usually increasing with the iteration; if they
+        # are not (e.g. restarted numbering) fall back to buckets.
+        episode = self.df['episode'].values
+        self._episode = _Ranges(episode) if np.all(episode[1:] >= episode[:-1]) else _Buckets(episode)
+
+        if actions is not None:
+            self.action_ids = np.asarray(actions)[order]
+        elif 'action' in self.df and not self.df['action'].isna().any():
+            self.action_ids = self.df['action'].values.astype(np.int64)
+        else:
+            self.action_ids = None
+        self._action = None if self.action_ids is None else _Buckets(self.action_ids)
+        self._waypoint = _Buckets(self.df['closest_waypoint'].values) if 'closest_waypoint' in self.df else None
+
+        x, y = self.df['x'].values, self.df['y'].values
+        self.origin = (np.nanmin(x), np.nanmin(y))
+        col, row = self._cell(x, y)
+        self.grid_width = int(col.max()) + 1
+        self._grid = _Buckets(row * self.grid_width + col)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _cell(self, x, y):
+        col = np.floor((np.asarray(x) - self.origin[0]) / self.cell).astype(np.int64)
+        row = np.floor((np.asarray(y) - self.origin[1]) / self.cell).astype(np.int64)
+        return col, row
+
+    def _region(self, region):
+        xmin, xmax, ymin, ymax = region
+        c0, r0 = self._cell(xmin, ymin)
+        c1, r1 = self._cell(xmax, ymax)
+        c0, r0 = max(int(c0), 0), max(int(r0), 0)
+        c1 = min(int(c1), self.grid_width - 1)
+        cols = np.arange(c0, c1 + 1)
+        rows = np.arange(r0, int(r1) + 1)
+        candidates = self._grid.rows((rows[:, None] * self.grid_width + cols[None, :]).ravel())
+        x = self.df['x'].values[candidates]
+        y = self.df['y'].values[candidates]
+        return candidates[(x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)]
+
+    def _selections(self, iterations, episodes, actions, waypoints, region):
+        out = []
+        if iterations is not None:
+            out.append(self._iteration.select(iterations))
+        if episodes is not None:
+            out.append(self._episode.select(episodes) if isinstance(self._episode, _Ranges)
+                       else self._episode.rows(episodes))
+        if actions is not None:
+            if self._action is None:
+                raise ValueError('trace has no action index; pass actions= to TraceQuery')
+            out.append(self._action.rows(actions))
+        if waypoints is not None:
+            out.append(self._waypoint.rows(waypoints))
+        if region is not None:
+            out.append(self._region(region))
+        return out
+
+    def rows(self, iterations=None, episodes=None, actions=None, waypoints=None, region=None):
+        """
+        Matching positions in the sorted trace, as a (start, stop) range when
+        contiguous or a sorted array. `iterations`, `episodes`, `actions` and
+        `waypoints` take a value, a range or a list of values; `region` is
+        (xmin, xmax, ymin, ymax) in meters.
+        """
+        selections = sorted(self._selections(iterations, episodes, actions, waypoints, region), key=_size)
+        if not selections:
+            return (0, len(self.df))
+        result = selections[0]
+        for other in selections[1:]:
+            if _size(result) == 0:
+                break
+            result = _intersect(result, other)
+        return result
+
+    def select(self, iterations=None, episodes=None, actions=None, waypoints=None, region=None):
+        """Matching rows as a DataFrame; a zero-copy slice when the rows are contiguous."""
+        result = self.rows(iterations, episodes, actions, waypoints, region)
+        if isinstance(result, tuple):
+            return self.df.iloc[result[0]:result[1]]
+        return self.df.take(result)
+
+    def column(self, name, **query):
+        """One column of the matching rows as a numpy array (a view when contiguous)."""
+        result = self.rows(**query)
+        values = self.df[name].values
+        return values[result[0]:result[1]] if isinstance(result, tuple) else values[result]
+
+    def count(self, **query):
+        return _size(self.rows(**query))
+
+    def iteration_counts(self):
+        values, counts = np.unique(self._iteration.values, return_counts=True)
+        return pd.Series(counts, index=values)
+
+    def action_counts(self):
+        return None if self._action is None else self._action.counts()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+'''
+Run track_planner over a whole track library in a process pool.
+
+Results are cached as .npz files keyed by the content hash of the track file
+and a hash of the planner parameters, so re-running only plans tracks (or
+parameter sets) that changed.
+
+    python batch_planner.py --tracks ../Analysis/tracks --pattern "2022_*" --workers 4
+'''
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from track_planner import DEFAULT_PARAMS, plan_track
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+
+def file_hash(fname):
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def params_hash(params):
+    p = dict(DEFAULT_PARAMS)
+    p.update(params or {})
+    p['lookahead_steps'] = list(p['lookahead_steps'])
+    return hashlib.sha1(json.dumps(p, sort_keys=True).encode()).hexdigest()
+
+
+def cache_path(cache_dir, fname, params=None):
+    name = os.path.splitext(os.path.basename(fname))[0]
+    return os.path.join(cache_dir, '%s-%s-%s.npz' % (name, file_hash(fname)[:16],
+                                                     params_hash(params)[:16]))
+
+
+def load_plan(fname, params=None, cache_dir=DEFAULT_CACHE):
+    """Return the cached plan for a track file, or None if it was not planned yet."""
+    path = cache_path(cache_dir, fname, params)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return dict(data)
+
+
+def _plan_one(fname, out_path, params):
+    plan = plan_track(np.load(fname), params)
+    tmp = out_path + '.tmp.npz'
+    np.savez(tmp, **plan)
+    os.replace(tmp, out_path)
+    return fname, float(plan['lap_time'])
+
+
+def plan_all(track_files, params=None, cache_dir=DEFAULT_CACHE, workers=None, force=False):
+    """
+    Plan every track in `track_files`, skipping those already in the cache.
+
+    Returns a list of (track file, cache file, status) with status one of
+    'cached', 'planned' or 'failed: <error>'.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    results = []
+    todo = {}
+    for fname in track_files:
+        out_path = cache_path(cache_dir, fname, params)
+        if os.path.exists(out_path) and not force:
+            results.append((fname, out_path, 'cached'))
+        else:
+            todo[fname] = out_path
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_plan_one, fname, out_path, params): fname
+                       for fname, out_path in todo.items()}
+            for future in as_completed(futures):
+                fname = futures[future]
+                try:
+                    future.result()
+                    status = 'planned'
+                except Exception as e:
+                    status = 'failed: %s' % e
+                results.append((fname, todo[fname], status))
+
+    return sorted(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plan racing line, speed profile and '
+                                                 'lookahead tables for a track library.')
+    parser.add_argument('--tracks', default=os.path.join('..', 'Analysis', 'tracks'),
+                        help='directory with the .npy track files')
+    parser.add_argument('--pattern', default='*.npy', help='glob for track files')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='output cache directory')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='re-plan cached tracks')
+    parser.add_argument('--params', default=None,
+                        help='JSON object overriding planner parameters, e.g. \'{"max_speed": 3.5}\'')
+    args = parser.parse_args(argv)
+
+    pattern = args.pattern if args.pattern.endswith('.npy') else args.pattern + '.npy'
+    track_files = sorted(glob.glob(os.path.join(args.tracks, pattern)))
+    if not track_files:
+        print('no track files match %s' % os.path.join(args.tracks, pattern))
+        return 1
+
+    params = json.loads(args.params) if args.params else None
+    results = plan_all(track_files, params, args.cache, args.workers, args.force)
+
+    failed = 0
+    for fname, out_path, status in results:
+        print('%-40s %s' % (os.path.basename(fname), status))
+        failed += status.startswith('failed')
+    print('%d tracks, %d planned, %d cached, %d failed' % (
+        len(results), sum(r[2] == 'planned' for r in results),
+        sum(r[2] == 'cached' for r in results), failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
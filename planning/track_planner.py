@@ -0,0 +1,185 @@
+'''
+Offline track planning from the waypoint files in Analysis/tracks.
+
+For a track this computes a racing line inside the borders, a speed profile
+along that line and lookahead tables (index, heading and distance to the
+waypoint N steps ahead) that reward functions can use instead of walking the
+waypoint list on every step.
+'''
+import numpy as np
+
+from track_resample import resample_track
+
+DEFAULT_PARAMS = {
+    'resample_step': None,      # meters between planned points, None keeps the waypoints
+    'line_iterations': 500,     # smoothing passes for the racing line
+    'line_alpha': 0.5,          # how far a point moves towards its neighbours per pass
+    'border_margin': 0.2,       # fraction of the half width kept free at each border
+    'min_speed': 1.0,
+    'max_speed': 4.0,
+    'max_lateral_accel': 3.0,   # m/s^2, bounds corner speed: v = sqrt(a / k)
+    'max_accel': 2.0,           # m/s^2 along the line
+    'max_decel': 3.0,
+    'lookahead_steps': (1, 3, 5, 8),
+}
+
+
+def load_track(fname):
+    """
+    Load a track file as (center, left, right) arrays of shape (N, 2).
+
+    The closing waypoint (a copy of the first one) and repeated consecutive
+    waypoints are dropped, so the result is an open list of unique points
+    describing a closed loop.
+    """
+    data = np.load(fname)
+    return split_track(data)
+
+
+def split_track(data):
+    data = np.asarray(data, dtype=float)
+    center = data[:, 0:2]
+    keep = np.ones(len(data), dtype=bool)
+    keep[1:] = np.any(np.diff(center, axis=0) != 0, axis=1)
+    data = data[keep]
+    if len(data) > 1 and np.allclose(data[0, 0:2], data[-1, 0:2]):
+        data = data[:-1]
+    return data[:, 0:2], data[:, 2:4], data[:, 4:6]
+
+
+def segment_lengths(points):
+    """Length of the segment from each point to the next one, wrapping around."""
+    return np.hypot(*(np.roll(points, -1, axis=0) - points).T)
+
+
+def curvature(points):
+    """
+    Unsigned curvature (1/radius) at every point of a closed polyline, from the
+    circle through the previous, current and next point.
+    """
+    prev_pt = np.roll(points, 1, axis=0)
+    next_pt = np.roll(points, -1, axis=0)
+    a = np.hypot(*(points - prev_pt).T)
+    b = np.hypot(*(next_pt - points).T)
+    c = np.hypot(*(next_pt - prev_pt).T)
+    cross = (points[:, 0] - prev_pt[:, 0]) * (next_pt[:, 1] - prev_pt[:, 1]) - \
+            (points[:, 1] - prev_pt[:, 1]) * (next_pt[:, 0] - prev_pt[:, 0])
+    denom = a * b * c
+    k = np.zeros(len(points))
+    nz = denom > 0
+    k[nz] = 2.0 * np.abs(cross[nz]) / denom[nz]
+    return k
+
+
+def racing_line(center, left, right, iterations=500, alpha=0.5, margin=0.2):
+    """
+    Shortcut corners by repeatedly pulling each point towards the midpoint of
+    its neighbours, then clamping it back between the borders.
+
+    Points are kept on the segment between the left and right border at each
+    waypoint, as a lateral offset t in [-1, 1] (0 is the centerline).
+    """
+    half = (left - right) / 2.0
+    half_sq = np.sum(half * half, axis=1)
+    half_sq[half_sq == 0] = 1.0
+    limit = 1.0 - margin
+
+    line = center.copy()
+    for _ in range(iterations):
+        target = (np.roll(line, 1, axis=0) + np.roll(line, -1, axis=0)) / 2.0
+        line = line + alpha * (target - line)
+        t = np.sum((line - center) * half, axis=1) / half_sq
+        t = np.clip(t, -limit, limit)
+        line = center + t[:, None] * half
+    return line
+
+
+def speed_profile(line, min_speed=1.0, max_speed=4.0, max_lateral_accel=3.0,
+                  max_accel=2.0, max_decel=3.0):
+    """
+    Corner-limited speed at each point of the line, then limited by how fast
+    the car can accelerate out of and brake into each corner (v^2 = u^2 + 2as).
+    """
+    k = curvature(line)
+    with np.errstate(divide='ignore'):
+        speed = np.sqrt(max_lateral_accel / k)
+    speed = np.clip(speed, min_speed, max_speed)
+
+    ds = segment_lengths(line)
+    n = len(line)
+    # Two passes over the loop so the limits carry across the start line.
+    for i in range(2 * n):
+        cur, nxt = i % n, (i + 1) % n
+        speed[nxt] = min(speed[nxt], np.sqrt(speed[cur] ** 2 + 2 * max_accel * ds[cur]))
+    for i in range(2 * n, 0, -1):
+        cur, prv = i % n, (i - 1) % n
+        speed[prv] = min(speed[prv], np.sqrt(speed[cur] ** 2 + 2 * max_decel * ds[prv]))
+    return speed
+
+
+def lookahead_tables(points, steps=(1, 3, 5, 8)):
+    """
+    For every point and every step count in `steps`: the index of the point that
+    many steps ahead, the heading towards it (degrees, like params['heading'])
+    and the distance along the line to it. Arrays have shape (N, len(steps)).
+    """
+    n = len(points)
+    steps = np.asarray(steps, dtype=int)
+    idx = np.arange(n)
+    ahead = (idx[:, None] + steps[None, :]) % n
+
+    delta = points[ahead] - points[:, None, :]
+    heading = np.degrees(np.arctan2(delta[..., 1], delta[..., 0]))
+
+    laps = 2 + steps.max() // n
+    cum = np.concatenate(([0.0], np.cumsum(np.tile(segment_lengths(points), laps))))
+    dist = cum[idx[:, None] + steps[None, :]] - cum[idx][:, None]
+    return ahead, heading, dist
+
+
+def plan_track(track, params=None):
+    """
+    Run the full planning pipeline for one track.
+
+    `track` is the raw (N, 6) waypoint array from Analysis/tracks. Returns a
+    dict of numpy arrays that can be saved with np.savez. With `resample_step`
+    set the plan is computed on a uniform arc-length grid and 'orig_to_plan'
+    maps original waypoint indices to plan indices.
+    """
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        p.update(params)
+
+    mapping = None
+    if p['resample_step']:
+        track, mapping = resample_track(track, p['resample_step'])
+
+    center, left, right = split_track(track)
+    line = racing_line(center, left, right, iterations=p['line_iterations'],
+                       alpha=p['line_alpha'], margin=p['border_margin'])
+    speed = speed_profile(line, min_speed=p['min_speed'], max_speed=p['max_speed'],
+                          max_lateral_accel=p['max_lateral_accel'],
+                          max_accel=p['max_accel'], max_decel=p['max_decel'])
+    ahead, heading, dist = lookahead_tables(line, p['lookahead_steps'])
+
+    ds = segment_lengths(line)
+    lap_time = np.sum(ds / speed)
+
+    plan = {
+        'center': center,
+        'left': left,
+        'right': right,
+        'line': line,
+        'curvature': curvature(line),
+        'speed': speed,
+        'lookahead_steps': np.asarray(p['lookahead_steps'], dtype=int),
+        'lookahead_index': ahead,
+        'lookahead_heading': heading,
+        'lookahead_distance': dist,
+        'line_length': np.sum(ds),
+        'lap_time': lap_time,
+    }
+    if mapping is not None:
+        plan['orig_to_plan'] = mapping['orig_to_resampled']
+        plan['plan_to_orig'] = mapping['resampled_to_orig']
+    return plan
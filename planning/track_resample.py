@@ -0,0 +1,66 @@
+'''
+Re-parameterize a track at a fixed arc-length step.
+
+Waypoint spacing in the bundled tracks varies (0 to ~0.3 m), so anything
+indexed by waypoint count - curvature from neighbouring waypoints, a fixed
+FUTURE_STEP lookahead - covers a different distance on straights and in
+hairpins. Resampling gives a uniform grid, and the mapping tables translate
+between original waypoint indices (what params['closest_waypoints'] returns)
+and resampled indices.
+'''
+import numpy as np
+
+
+def resample_track(track, step=0.1):
+    """
+    Resample centerline and both borders of a raw (N, 6) track array so that
+    consecutive centerline points are `step` meters apart along the loop.
+
+    The step is adjusted slightly so the loop closes evenly. Borders are
+    interpolated at the same parameter as the centerline, so row i of the
+    result is still a (center, left, right) triple.
+
+    Returns (resampled, mapping): `resampled` is an (M, 6) array without a
+    closing duplicate point, `mapping` a dict of arrays:
+        s                  arc length of each resampled point
+        resampled_to_orig  original row of the segment each resampled point lies on
+        fraction           position along that segment, 0..1
+        orig_to_resampled  nearest resampled index for every original row
+    """
+    track = np.asarray(track, dtype=float)
+    n = len(track)
+    closed = np.allclose(track[0, 0:2], track[-1, 0:2])
+    pts = track if closed else np.vstack([track, track[:1]])
+    rows = np.arange(len(pts)) % n
+
+    seg = np.hypot(*np.diff(pts[:, 0:2], axis=0).T)
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    total = cum[-1]
+
+    m = max(int(round(total / step)), 3)
+    spacing = total / m
+    s = np.arange(m) * spacing
+
+    # np.interp needs strictly increasing sample positions, so skip repeated waypoints.
+    keep = np.concatenate(([True], seg > 0))
+    resampled = np.column_stack([np.interp(s, cum[keep], pts[keep, c]) for c in range(6)])
+
+    seg_idx = np.clip(np.searchsorted(cum, s, side='right') - 1, 0, len(seg) - 1)
+    seg_len = seg[seg_idx]
+    fraction = np.zeros(m)
+    nz = seg_len > 0
+    fraction[nz] = (s[nz] - cum[seg_idx][nz]) / seg_len[nz]
+
+    orig_to_resampled = np.rint(cum[:n] / spacing).astype(int) % m
+
+    mapping = {
+        's': s,
+        'resampled_to_orig': rows[seg_idx],
+        'fraction': fraction,
+        'orig_to_resampled': orig_to_resampled,
+    }
+    return resampled, mapping
+
+
+def resample_file(fname, step=0.1):
+    return resample_track(np.load(fname), step)